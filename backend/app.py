@@ -1,18 +1,36 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
 from bson import json_util, ObjectId
-import bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, current_user, jwt_required
+from werkzeug.local import LocalProxy
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
+import csv
 import json
-import uuid
-import joblib
-import pandas as pd
+import hmac
 import re
 import logging
+from inference import FeatureEncodingError
+from prediction_cache import TTLCache
+from image_store import ImageStore, UploadError, original_filename
+from static_files import REVALIDATE, StaticFiles
+from passwords import PasswordHasher, PasswordPoolBusy
+from serialization import DETAIL_PROJECTION, LISTING_PROJECTION, json_response
+from response_cache import ResponseCache, create_backend, normalized_args
+from model_registry import ModelFiles, ModelRegistry
+from mongo import MongoConnection, pool_options_from_env
+from indexes import ensure_indexes
+from search import backfill_search_fields, suggest
+from listings import (IMPORT_FORMATS, ListingValidationError, build_listing, export_listings, import_format,
+                      import_listings, read_rows)
+from car_stats import (category_counts, listing_count, price_histogram, reconcile, record_added_many,
+                       record_removed)
+from car_queries import build_car_filter, car_page_payload, live, nearest_listings, plan_car_page
+from reaper import Reaper, remove_unreferenced, tombstone
+from metrics import REGISTRY, MongoCommandTimer, SlowRequestProfiler, instrument, timed
+from jobs import JobFailed, JobQueue, QueueFull
+from writes import insert_listings, update_listings, update_users
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -21,90 +39,393 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app, resources={
-    r"/api/*": {"origins": "http://localhost:3000"},
-    r"/uploads/*": {"origins": "http://localhost:3000"},
-    r"/predict": {"origins": "http://localhost:3000"}
-})
+bp = Blueprint("drivewise", __name__)
 
 # MongoDB configuration
-mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-client = MongoClient(mongo_uri)
-db = client["drivewise"]
-users_collection = db["users"]
-cars_collection = db["cars"]
-
-# JWT configuration
-app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "your-secret-key")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
-jwt = JWTManager(app)
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "true").lower() == "true"
 
 # Uploads directory configuration
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
+# Authenticated requests load their user once, from a short-TTL cache
+# keyed by the token identity (the user id; tokens issued before that carry
+# the email). Writes to a user bump the "users" generation in the shared
+# response cache backend, which every worker checks before trusting its
+# cached copy; with the response cache disabled, other workers catch up
+# within USER_CACHE_TTL seconds.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+USER_PROJECTION = {"password": 0}
+
+# Listing pagination: totals per filter are cached briefly so paging
+# through results does not re-count the collection on every request. Every
+# listing write starts new totals (see get_cars).
+MAX_PAGE_SIZE = 100
+CAR_COUNT_CACHE_TTL = float(os.getenv("CAR_COUNT_CACHE_TTL", 30))
+
+# Bulk imports are written IMPORT_BATCH_SIZE rows at a time; at most
+# MAX_IMPORT_ERRORS row errors are returned
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 500))
+MAX_IMPORT_ERRORS = int(os.getenv("MAX_IMPORT_ERRORS", 1000))
+
+# Whole-response cache for category counts and the first listing pages.
+# RESPONSE_CACHE_BACKEND is "local" (per process), "sqlite" (one file shared
+# by every worker on the host) or "none"; writes invalidate by tag. "local"
+# only suits a single process -- gunicorn.conf.py defaults to "sqlite".
+RESPONSE_CACHE_MAX_PAGE = int(os.getenv("RESPONSE_CACHE_MAX_PAGE", 3))
+response_cache = ResponseCache(
+    create_backend(
+        os.getenv("RESPONSE_CACHE_BACKEND", "local"),
+        os.getenv("RESPONSE_CACHE_PATH", os.path.join(os.getcwd(), "response_cache.sqlite3"))
+    ),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", 60))
+)
+
 # React build directory
 REACT_BUILD_FOLDER = os.path.join(os.getcwd(), "../client/build")  # Adjust path as needed
 
+# Uploads are content-addressed and build assets under static/ carry a hash
+# in their names, so both are cached by browsers for good; index.html and
+# other unhashed build files are revalidated with their ETag
+STATIC_STAT_TTL = float(os.getenv("STATIC_STAT_TTL", 10))
+
 # Load the Random Forest model and label encoder
 MODEL_PATH = os.path.join(os.getcwd(), "models", "random_forest_model.pkl")
 ENCODER_PATH = os.path.join(os.getcwd(), "models", "car_name_label_encoder.pkl")
-try:
-    model = joblib.load(MODEL_PATH)
-    car_name_encoder = joblib.load(ENCODER_PATH)
-except FileNotFoundError:
-    logger.error(f"Model or encoder file not found at {MODEL_PATH} or {ENCODER_PATH}")
-    exit(1)
+FOREST_PATH = os.path.join(os.getcwd(), "models", "random_forest_model.forest")
+SCHEMA_PATH = os.path.join(os.getcwd(), "models", "feature_schema.json")
+MODEL_PIN_PATH = os.path.join(os.getcwd(), "models", "rollback.json")
+USE_COMPILED_FOREST = os.getenv("USE_COMPILED_FOREST", "true").lower() == "true"
+MAX_PREDICT_BATCH = int(os.getenv("MAX_PREDICT_BATCH", 10000))
+
+# Concurrent /predict calls are coalesced into one model call per window
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", 2))
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", 64))
+PREDICT_TIMEOUT = float(os.getenv("PREDICT_TIMEOUT", 10))
+RECOMMENDATION_PRICE_BAND = float(os.getenv("RECOMMENDATION_PRICE_BAND", 0.2))
+MAX_RECOMMENDED_MODELS = 10
+MAX_LISTINGS_PER_MODEL = 20
+
+# Deletes only tombstone listings; the reaper removes them and their uploads
+# in the background every REAPER_INTERVAL seconds (0 disables, e.g. when
+# reaper.py runs from cron) and sweeps uploads/ for unreferenced files.
+# Nothing younger than UPLOAD_GRACE seconds is removed: a re-upload of the
+# same bytes refreshes the file's mtime before its listing is written.
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", 60))
+UPLOAD_GRACE = float(os.getenv("UPLOAD_GRACE", 3600))
+
+# /api/list-car, /api/update-car/<id> and /api/update-user validate the
+# request and store its uploads inline; with "Prefer: respond-async" they
+# then queue the database write and answer 202 with a job to poll at
+# /api/jobs/<id>. The queue is one SQLite file per host (JOB_QUEUE_PATH);
+# JOB_WORKERS threads per process write queued jobs in batches of up to
+# JOB_BATCH_SIZE, and beyond JOB_MAX_PENDING queued jobs these requests get
+# a 429. Keep UPLOAD_GRACE well above the longest expected queue delay.
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(os.getcwd(), "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+
+# Request and stage latency histograms are served at /metrics (behind
+# METRICS_TOKEN if set). Under gunicorn, METRICS_DIR lets every worker's
+# numbers show up in each scrape. PROFILE_SLOW_MS > 0 samples request
+# stacks and writes those slower than that to PROFILE_DIR.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_DIR = os.getenv("METRICS_DIR")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+
+# Retrained models are picked up from models/ (polled every
+# MODEL_POLL_INTERVAL seconds, 0 disables) or via the admin endpoints. A
+# rollback is pinned in MODEL_PIN_PATH, so every worker's poll follows it;
+# with polling disabled it only reaches the worker that handled it.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+class Services:
+    # Everything an app instance holds on to. create_app() builds it in the
+    # process that imports the app -- under gunicorn --preload that is the
+    # master, so the model is loaded once and shared copy-on-write by the
+    # workers. Sockets, threads and pools are opened lazily per process;
+    # start() and shutdown() run in each worker (see gunicorn.conf.py).
+    def __init__(self):
+        self.mongo = MongoConnection(MONGO_URI, "drivewise", event_listeners=[MongoCommandTimer()],
+                                     **pool_options_from_env())
+
+        # Password hashing runs in a bounded process pool; when it is saturated
+        # the auth endpoints answer 429. Changing BCRYPT_ROUNDS rehashes on login.
+        self.password_hasher = PasswordHasher(
+            rounds=int(os.getenv("BCRYPT_ROUNDS", 12)),
+            workers=int(os.environ["PASSWORD_WORKERS"]) if os.getenv("PASSWORD_WORKERS") else None,
+            max_pending=int(os.getenv("PASSWORD_MAX_PENDING", 0)) or None
+        )
+
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        self.image_store = ImageStore(
+            UPLOAD_FOLDER,
+            max_size=MAX_FILE_SIZE,
+            allowed_extensions=ALLOWED_EXTENSIONS,
+            workers=int(os.getenv("IMAGE_WORKERS", 2))
+        )
+        self.upload_files = StaticFiles(UPLOAD_FOLDER, immutable=lambda path: True, stat_ttl=STATIC_STAT_TTL)
+        self.build_files = StaticFiles(
+            REACT_BUILD_FOLDER, immutable=lambda path: path.startswith("static/"), stat_ttl=STATIC_STAT_TTL
+        )
+
+        self.car_count_cache = TTLCache(maxsize=1024, ttl=CAR_COUNT_CACHE_TTL)
+        self.user_cache = TTLCache(maxsize=int(os.getenv("USER_CACHE_SIZE", 10000)), ttl=USER_CACHE_TTL)
+        self.reaper = Reaper(
+            self.mongo,
+            self.image_store,
+            interval=REAPER_INTERVAL,
+            sweep_interval=float(os.getenv("UPLOAD_SWEEP_INTERVAL", 3600)),
+            tombstone_grace=float(os.getenv("TOMBSTONE_GRACE", 300)),
+            upload_grace=UPLOAD_GRACE
+        )
+
+        self.job_queue = JobQueue(
+            JOB_QUEUE_PATH,
+            {"list_car": self._insert_listings, "update_car": self._update_listings, "update_user": self._update_users},
+            workers=JOB_WORKERS,
+            batch_size=int(os.getenv("JOB_BATCH_SIZE", 200)),
+            max_pending=int(os.getenv("JOB_MAX_PENDING", 10000))
+        )
+
+        # Repeated /predict inputs are served from an LRU/TTL cache of
+        # probabilities, keyed by model version so a swapped-in model never
+        # sees stale entries
+        prediction_cache = TTLCache(
+            maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", 4096)),
+            ttl=float(os.getenv("PREDICTION_CACHE_TTL", 3600))
+        )
+        self.prediction_cache = prediction_cache
+        self.model_registry = ModelRegistry(
+            ModelFiles(MODEL_PATH, ENCODER_PATH, FOREST_PATH, SCHEMA_PATH, use_compiled=USE_COMPILED_FOREST),
+            batcher_options={"max_batch_size": PREDICT_BATCH_MAX_ROWS, "max_wait": PREDICT_BATCH_WINDOW_MS / 1000},
+            poll_interval=float(os.getenv("MODEL_POLL_INTERVAL", 5)),
+            on_swap=lambda bundle: prediction_cache.clear(),
+            pin_path=MODEL_PIN_PATH
+        )
+
+    def bootstrap(self):
+        db = self.mongo.db
+        if ENSURE_INDEXES:
+            ensure_indexes(db)
+            backfilled = backfill_search_fields(db["cars"])
+            if backfilled:
+                logger.info(f"Added search fields to {backfilled} existing listings")
+        # Category and price stats are maintained on every write; build them
+        # once for databases that predate them (car_stats.py repairs drift)
+        if db["car_stats"].estimated_document_count() == 0 and db["cars"].estimated_document_count():
+            reconcile(db["cars"], db["car_stats"])
+
+    # Job queue handlers: a batch write, then this process's caches
+    def _insert_listings(self, payloads, retry=False):
+        results = insert_listings(self.mongo.db, payloads, retry=retry)
+        response_cache.invalidate("cars", "categories")
+        return results
+
+    def _update_listings(self, payloads, retry=False):
+        results = update_listings(self.mongo.db, payloads, on_write=self._listings_updated, retry=retry)
+        # The first attempt may have moved listings between categories or
+        # price buckets, which a retry no longer sees as a change
+        if retry:
+            response_cache.invalidate("categories")
+        return results
+
+    def _listings_updated(self, changes):
+        if any(new.get(field) != old.get(field) for old, new in changes for field in ("category", "price")):
+            response_cache.invalidate("cars", "categories")
+        else:
+            response_cache.invalidate("cars")
+
+    # Setting the same fields again is harmless, so retries need nothing extra
+    def _update_users(self, payloads, retry=False):
+        return update_users(self.mongo.db, payloads, on_write=self._users_updated)
+
+    def _users_updated(self, payloads):
+        self.user_cache.delete(*[key for payload in payloads for key in (str(payload["id"]), payload["email"])])
+        response_cache.invalidate("users")
+
+    # Per-process background work
+    def start(self):
+        self.model_registry.start_watching()
+        self.reaper.start()
+        self.job_queue.start()
+
+    def shutdown(self):
+        self.job_queue.close()
+        self.reaper.close()
+        self.model_registry.close()
+        self.image_store.close()
+        self.password_hasher.close()
+        self.mongo.close()
+
+
+def create_app():
+    app = Flask(__name__, static_folder=None)  # build assets are served by serve_react_app
+    CORS(app, resources={
+        r"/api/*": {"origins": "http://localhost:3000"},
+        r"/uploads/*": {"origins": "http://localhost:3000"},
+        r"/predict": {"origins": "http://localhost:3000"}
+    })
+
+    # JWT configuration
+    app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "your-secret-key")
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
+    jwt = JWTManager(app)
+    jwt.user_lookup_loader(lambda jwt_header, jwt_data: load_user(jwt_data["sub"]))
+    jwt.user_lookup_error_loader(lambda jwt_header, jwt_data: (jsonify({"error": "User not found"}), 404))
+    app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
-# Helper functions
-def parse_json(data):
-    if isinstance(data, list):
-        return [parse_json(item) for item in data]
-    if isinstance(data, dict):
-        result = {}
-        for key, value in data.items():
-            if key == "_id" and isinstance(value, ObjectId):
-                result[key] = str(value)
-            else:
-                result[key] = parse_json(value)
-        return result
-    return data
+    try:
+        services = Services()
+    except FileNotFoundError:
+        logger.error(f"Model or encoder file not found at {MODEL_PATH} or {ENCODER_PATH}")
+        raise SystemExit(1)
+    services.bootstrap()
+    # Workers open their own connections after fork
+    services.mongo.close()
+    app.extensions["drivewise"] = services
+    REGISTRY.configure(snapshot_dir=METRICS_DIR)
+    profiler = SlowRequestProfiler(PROFILE_DIR, PROFILE_SLOW_MS / 1000) if PROFILE_SLOW_MS > 0 else None
+    instrument(app, profiler=profiler)
+    app.register_blueprint(bp)
+    return app
+
+
+# Request-time handles on the current app's services, so the route code
+# reads like it uses plain module globals
+def _service(get):
+    return LocalProxy(lambda: get(current_app.extensions["drivewise"]))
+
+db = _service(lambda s: s.mongo.db)
+users_collection = _service(lambda s: s.mongo.db["users"])
+cars_collection = _service(lambda s: s.mongo.db["cars"])
+car_stats_collection = _service(lambda s: s.mongo.db["car_stats"])
+password_hasher = _service(lambda s: s.password_hasher)
+image_store = _service(lambda s: s.image_store)
+upload_files = _service(lambda s: s.upload_files)
+build_files = _service(lambda s: s.build_files)
+car_count_cache = _service(lambda s: s.car_count_cache)
+user_cache = _service(lambda s: s.user_cache)
+prediction_cache = _service(lambda s: s.prediction_cache)
+model_registry = _service(lambda s: s.model_registry)
+job_queue = _service(lambda s: s.job_queue)
+
+def too_many_requests():
+    response = jsonify({"error": "Too many requests, please try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 429
+
+def wants_async():
+    return "respond-async" in request.headers.get("Prefer", "")
+
+# Queues a write for the job workers and answers 202 with where to poll
+def enqueue_write(kind, payload, **extra):
+    try:
+        job_id = job_queue.submit(kind, payload, str(current_user["_id"]))
+    except QueueFull:
+        return too_many_requests()
+    response = jsonify({"message": "Accepted", "jobId": job_id, "status": "queued", **extra})
+    response.headers["Location"] = f"/api/jobs/{job_id}"
+    response.headers["Preference-Applied"] = "respond-async"
+    return response, 202
 
+# Helper functions
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Uploads are shared by content address, so a file is only removed once no
+# listing or profile refers to it any more, and not while another request
+# may have just stored the same bytes (younger files go with the sweep)
+def remove_unreferenced_uploads(urls):
+    remove_unreferenced(db, image_store, urls, min_age=UPLOAD_GRACE)
+
+# The user behind a token identity, without the password hash. Shared by
+# every caller; treat it as read-only. A cached copy is only used while the
+# "users" generation it was read under is current, so a user changed or
+# deleted through another worker is re-read at once.
+def load_user(identity):
+    generation = response_cache.generation("users")
+    entry = user_cache.get(identity)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    query = {"_id": ObjectId(identity)} if ObjectId.is_valid(identity) else {"email": identity}
+    user = users_collection.find_one(query, USER_PROJECTION)
+    if user is not None:
+        user_cache.set(identity, (generation, user))
+    return user
+
+def forget_user(user):
+    user_cache.delete(str(user["_id"]), user["email"])
+    response_cache.invalidate("users")
+
+def save_uploads(files):
+    saved = []
+    try:
+        for file in files:
+            if file and file.filename:
+                with timed("file_io"):
+                    saved.append(image_store.save(file))
+    except UploadError:
+        remove_unreferenced_uploads([upload["url"] for upload in saved])
+        raise
+    return saved
+
 def validate_phone_number(phone):
     pattern = r"^(\+92[0-9]{10}|0[0-9]{10})$"
     return bool(re.match(pattern, phone))
 
+# Cache key for a listing page, or None for pages that are not cached
+def car_page_cache_key():
+    if request.args.get("cursor"):
+        return None
+    try:
+        if int(request.args.get("page", 1)) > RESPONSE_CACHE_MAX_PAGE:
+            return None
+    except ValueError:
+        return None
+    return normalized_args({"page": "1", "limit": "9", "sort": "price-asc"})
+
+def parse_top_k(data):
+    top_k = data.get("top_k", request.args.get("top_k")) if isinstance(data, dict) else request.args.get("top_k")
+    if top_k is None:
+        return None
+    top_k = int(top_k)
+    if top_k < 1:
+        raise ValueError("top_k must be positive")
+    return top_k
+
 # Serve uploaded images
-@app.route("/uploads/<filename>")
+@bp.route("/uploads/<filename>")
 def uploaded_file(filename):
-    file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    if not os.path.exists(file_path):
+    with timed("file_io"):
+        response = upload_files.serve(filename)
+        if response is None:
+            # Variants are generated in the background; serve the original
+            # meanwhile, without letting browsers keep it under the variant URL
+            original = original_filename(filename)
+            response = upload_files.serve(original, cache_control=REVALIDATE) if original else None
+    if response is None:
         logger.warning(f"Image not found: {filename}")
         return jsonify({"error": "Image not found"}), 404
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    return response
 
 # Serve React app
-@app.route("/", defaults={"path": ""})
-@app.route("/<path:path>")
+@bp.route("/", defaults={"path": ""})
+@bp.route("/<path:path>")
 def serve_react_app(path):
     if path.startswith("api/") or path.startswith("uploads/") or path == "predict":
         return jsonify({"error": "Not found"}), 404
-    if os.path.exists(os.path.join(REACT_BUILD_FOLDER, path)):
-        return send_from_directory(REACT_BUILD_FOLDER, path)
-    if not os.path.exists(os.path.join(REACT_BUILD_FOLDER, "index.html")):
+    response = (build_files.serve(path) if path else None) or build_files.serve("index.html")
+    if response is None:
         logger.error(f"React build index.html not found at {REACT_BUILD_FOLDER}")
         return jsonify({"error": "Server misconfigured"}), 500
-    return send_file(os.path.join(REACT_BUILD_FOLDER, "index.html"))
+    return response
 
 # Signup endpoint
-@app.route("/api/signup", methods=["POST"])
+@bp.route("/api/signup", methods=["POST"])
 def signup():
     try:
         data = request.get_json()
@@ -122,7 +443,7 @@ def signup():
         if contact_number and not validate_phone_number(contact_number):
             return jsonify({"error": "Invalid phone number format. Use +923001234567 or 03001234567"}), 400
 
-        hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+        hashed_password = password_hasher.hash(password)
         user = {
             "fullName": full_name,
             "email": email,
@@ -133,12 +454,14 @@ def signup():
         users_collection.insert_one(user)
         logger.info(f"User registered: {email}")
         return jsonify({"message": "User registered successfully"}), 201
+    except PasswordPoolBusy:
+        return too_many_requests()
     except Exception as e:
         logger.error(f"Signup error: {str(e)}")
         return jsonify({"error": "Failed to register user"}), 500
 
 # Login endpoint
-@app.route("/api/login", methods=["POST"])
+@bp.route("/api/login", methods=["POST"])
 def login():
     try:
         data = request.get_json()
@@ -149,126 +472,144 @@ def login():
             return jsonify({"error": "Email and password are required"}), 400
 
         user = users_collection.find_one({"email": email})
-        if not user or not bcrypt.checkpw(password.encode("utf-8"), user["password"]):
+        if not user or not password_hasher.verify(password, user["password"]):
             logger.warning(f"Failed login attempt for: {email}")
             return jsonify({"error": "Invalid email or password"}), 401
 
-        access_token = create_access_token(identity=email)
+        if password_hasher.needs_rehash(user["password"]):
+            try:
+                users_collection.update_one(
+                    {"_id": user["_id"], "password": user["password"]},
+                    {"$set": {"password": password_hasher.hash(password)}}
+                )
+                logger.info(f"Rehashed password for: {email}")
+            except PasswordPoolBusy:
+                pass  # try again on a later login
+
+        # The email rides along so the async profile endpoint can fetch the
+        # user and their listings at the same time
+        access_token = create_access_token(identity=str(user["_id"]), additional_claims={"email": user["email"]})
         logger.info(f"User logged in: {email}")
         return jsonify({"token": access_token, "message": "Login successful"}), 200
+    except PasswordPoolBusy:
+        return too_many_requests()
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({"error": "Failed to login"}), 500
 
 # List car endpoint
-@app.route("/api/list-car", methods=["POST"])
+@bp.route("/api/list-car", methods=["POST"])
 @jwt_required()
 def list_car():
     try:
-        user_email = get_jwt_identity()
+        user_email = current_user["email"]
 
         if not request.form:
             return jsonify({"error": "Form data is required"}), 400
 
-        required_fields = ["name", "location", "price", "year", "mileage", "fuel", "transmission", "category"]
-        for field in required_fields:
-            if field not in request.form or not request.form[field]:
-                return jsonify({"error": f"{field} is required"}), 400
-
         try:
-            price = float(request.form["price"])
-            year = int(request.form["year"])
-            mileage = int(request.form["mileage"])
-        except (ValueError, TypeError):
-            return jsonify({"error": "Price, year, and mileage must be numeric"}), 400
+            car = build_listing(request.form, user_email)
+        except ListingValidationError as e:
+            return jsonify({"error": str(e)}), 400
 
-        image_urls = []
+        uploads = []
         if "images" in request.files:
-            files = request.files.getlist("images")
-            for file in files:
-                if file and allowed_file(file.filename):
-                    file.seek(0, os.SEEK_END)
-                    file_size = file.tell()
-                    if file_size > MAX_FILE_SIZE:
-                        return jsonify({"error": f"File {file.filename} exceeds 5MB limit"}), 400
-                    file.seek(0)
-                    filename = f"{uuid.uuid4().hex}.{file.filename.rsplit('.', 1)[1].lower()}"
-                    file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                    file.save(file_path)
-                    image_urls.append(f"/uploads/{filename}")
-                else:
-                    return jsonify({"error": f"Invalid file type for {file.filename}. Allowed: jpg, jpeg, png, gif"}), 400
-        else:
-            image_urls.append("https://via.placeholder.com/300x200")
-
-        car = {
-            "name": request.form["name"],
-            "location": request.form["location"],
-            "price": price,
-            "year": year,
-            "mileage": mileage,
-            "fuel": request.form["fuel"],
-            "transmission": request.form["transmission"],
-            "postedDays": 0,
-            "images": image_urls,
-            "featured": request.form.get("featured", "false").lower() == "true",
-            "make": request.form.get("make", ""),
-            "model": request.form.get("model", ""),
-            "category": request.form["category"],
-            "seller_email": user_email
-        }
-
-        result = cars_collection.insert_one(car)
-        car["_id"] = str(result.inserted_id)
+            try:
+                uploads = save_uploads(request.files.getlist("images"))
+            except UploadError as e:
+                return jsonify({"error": str(e)}), 400
+        if uploads:
+            car["images"] = [upload["url"] for upload in uploads]
+            car["thumbnails"] = [image_store.thumbnail_url(url) for url in car["images"]]
+
+        car["_id"] = ObjectId()
+        payload = {"car": car, "imageVariants": [upload["variants"] for upload in uploads]}
+        if wants_async():
+            return enqueue_write("list_car", payload, carId=str(car["_id"]))
+        result = job_queue.run_now("list_car", payload)
         logger.info(f"Car listed by {user_email}: {car['name']}")
-        return jsonify({"message": "Car listed successfully", "car": parse_json(car)}), 201
+        return json_response({"message": "Car listed successfully", **result}, 201)
+    except JobFailed as e:
+        return jsonify({"error": e.message}), e.status
     except Exception as e:
         logger.error(f"List car error: {str(e)}")
         return jsonify({"error": "Failed to list car"}), 500
 
+# Bulk import endpoint: CSV or NDJSON, either as the raw request body or as
+# a multipart "file" field. Rows are validated like /api/list-car, written in
+# batches and reported individually; images may be http(s) URLs, "|"-separated
+# in CSV.
+@bp.route("/api/cars/import", methods=["POST"])
+@jwt_required()
+def import_cars():
+    try:
+        user_email = current_user["email"]
+        upload = request.files.get("file")
+        if upload is not None:
+            stream, mimetype = upload.stream, upload.mimetype
+            if not request.args.get("format") and upload.filename.lower().endswith((".ndjson", ".jsonl")):
+                mimetype = "application/x-ndjson"
+        else:
+            stream, mimetype = request.stream, request.mimetype
+        try:
+            fmt = import_format(request.args.get("format"), mimetype)
+        except ListingValidationError as e:
+            return jsonify({"error": str(e)}), 400
+
+        def on_batch(cars):
+            record_added_many(car_stats_collection, cars)
+            response_cache.invalidate("cars", "categories")
+
+        try:
+            summary = import_listings(read_rows(stream, fmt), user_email, cars_collection, image_store,
+                                      on_batch=on_batch, batch_size=IMPORT_BATCH_SIZE, max_errors=MAX_IMPORT_ERRORS)
+        except (UnicodeDecodeError, csv.Error) as e:
+            logger.error(f"Import aborted for {user_email}: {str(e)}")
+            return jsonify({"error": f"Could not read {fmt} file: {str(e)}"}), 400
+        logger.info(f"Imported {summary['imported']} cars for {user_email} ({summary['failed']} failed)")
+        return json_response(summary, 201 if summary["imported"] else 200)
+    except Exception as e:
+        logger.error(f"Import cars error: {str(e)}")
+        return jsonify({"error": "Failed to import cars"}), 500
+
+# Bulk export endpoint: the seller's listings, streamed from the cursor
+@bp.route("/api/cars/export", methods=["GET"])
+@jwt_required()
+def export_cars():
+    user_email = current_user["email"]
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    cars = cars_collection.find(live({"seller_email": user_email}), LISTING_PROJECTION).batch_size(IMPORT_BATCH_SIZE)
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    logger.info(f"Exporting cars for {user_email} as {fmt}")
+    return Response(stream_with_context(export_listings(cars, fmt)), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=drivewise-listings.{fmt}",
+        "Cache-Control": "no-store"
+    })
+
 # Get all cars endpoint
-@app.route("/api/cars", methods=["GET"])
+@bp.route("/api/cars", methods=["GET"])
+@response_cache.cached(tags=("cars",), key_fn=car_page_cache_key)
 def get_cars():
     try:
-        query = {}
-        page = int(request.args.get("page", 1))
-        limit = int(request.args.get("limit", 9))
-        skip = (page - 1) * limit
-
-        if request.args.get("featured") == "true":
-            query["featured"] = True
-        if request.args.get("name"):
-            query["name"] = {"$regex": re.escape(request.args.get("name")), "$options": "i"}
-        if request.args.get("category"):
-            query["category"] = request.args.get("category")
-        if request.args.get("minPrice"):
-            query["price"] = query.get("price", {})
-            query["price"]["$gte"] = float(request.args.get("minPrice"))
-        if request.args.get("maxPrice"):
-            query["price"] = query.get("price", {})
-            query["price"]["$lte"] = float(request.args.get("maxPrice"))
-
-        sort_param = request.args.get("sort", "price-asc")
-        sort_field = "price"
-        sort_order = 1
-        if sort_param == "price-desc":
-            sort_order = -1
-        elif sort_param == "year-asc":
-            sort_field = "year"
-        elif sort_param == "year-desc":
-            sort_field = "year"
-            sort_order = -1
-
-        cars = list(cars_collection.find(query).sort(sort_field, sort_order).skip(skip).limit(limit))
-        total_cars = cars_collection.count_documents(query)
-        total_pages = (total_cars + limit - 1) // limit
-
-        return jsonify({
-            "cars": parse_json(cars),
-            "totalCars": total_cars,
-            "totalPages": total_pages,
-            "currentPage": page
-        }), 200
+        plan = plan_car_page(request.args, MAX_PAGE_SIZE)
+        query, limit = plan["query"], plan["limit"]
+
+        # The page is an index range scan in sort order; the total is read
+        # from the stats (unfiltered) or counted on the filter's index, and
+        # cached until the next listing write (the key carries the "cars"
+        # generation, so a rebuilt cached page never pairs new cars with an
+        # old total) or for CAR_COUNT_CACHE_TTL seconds
+        cars = list(cars_collection.find(plan["find_query"], LISTING_PROJECTION)
+                    .sort(plan["sort"]).skip(plan["skip"]).limit(limit + 1))
+        count_key = f"{response_cache.generation('cars')}|{json.dumps(query, sort_keys=True, default=str)}"
+        total_cars = car_count_cache.get(count_key)
+        if total_cars is None:
+            total_cars = cars_collection.count_documents(live(query)) if query else listing_count(car_stats_collection)
+            car_count_cache.set(count_key, total_cars)
+
+        return json_response(car_page_payload(plan, cars, total_cars))
     except (ValueError, TypeError) as e:
         logger.error(f"Invalid query parameters: {str(e)}")
         return jsonify({"error": "Invalid query parameters"}), 400
@@ -276,66 +617,98 @@ def get_cars():
         logger.error(f"Get cars error: {str(e)}")
         return jsonify({"error": "Failed to fetch cars"}), 500
 
+# Typeahead search endpoint
+@bp.route("/api/cars/suggest", methods=["GET"])
+def suggest_cars():
+    try:
+        text = request.args.get("q", "")
+        limit = min(int(request.args.get("limit", 8)), 50)
+        filters = live(build_car_filter({k: v for k, v in request.args.items() if k != "name"}))
+        projection = {"name": 1, "price": 1, "year": 1, "category": 1, "images": 1, "featured": 1}
+        cars = suggest(cars_collection, text, filters, limit=limit, projection=projection)
+        for car in cars:
+            car.pop("name_lower", None)
+            car.pop("search_tokens", None)
+        return json_response({"cars": cars})
+    except (ValueError, TypeError) as e:
+        logger.error(f"Invalid query parameters: {str(e)}")
+        return jsonify({"error": "Invalid query parameters"}), 400
+    except Exception as e:
+        logger.error(f"Suggest cars error: {str(e)}")
+        return jsonify({"error": "Failed to fetch suggestions"}), 500
+
 # Get category counts endpoint
-@app.route("/api/categories", methods=["GET"])
+@bp.route("/api/categories", methods=["GET"])
+@response_cache.cached(tags=("categories",))
 def get_category_counts():
     try:
-        pipeline = [
-            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-            {"$project": {"name": "$_id", "count": 1, "_id": 0}}
-        ]
-        counts = list(cars_collection.aggregate(pipeline))
+        counts = category_counts(car_stats_collection)
         logger.info("Fetched category counts")
         return jsonify(counts), 200
     except Exception as e:
         logger.error(f"Get categories error: {str(e)}")
         return jsonify({"error": "Failed to fetch categories"}), 500
 
+# Filter facets for the listings page: category counts and a price
+# histogram (optionally for one category), read from the stats collection
+@bp.route("/api/cars/facets", methods=["GET"])
+@response_cache.cached(tags=("categories",))
+def get_car_facets():
+    try:
+        category = request.args.get("category") or None
+        histogram = price_histogram(car_stats_collection, category)
+        return jsonify({
+            "categories": category_counts(car_stats_collection),
+            "priceHistogram": histogram,
+            "priceRange": {
+                "min": histogram[0]["min"] if histogram else None,
+                "max": histogram[-1]["max"] if histogram else None
+            }
+        }), 200
+    except Exception as e:
+        logger.error(f"Get facets error: {str(e)}")
+        return jsonify({"error": "Failed to fetch facets"}), 500
+
 # Get single car by ID endpoint
-@app.route("/api/cars/<id>", methods=["GET"])
+@bp.route("/api/cars/<id>", methods=["GET"])
 def get_car(id):
     try:
-        car = cars_collection.find_one({"_id": ObjectId(id)})
+        car = cars_collection.find_one(live({"_id": ObjectId(id)}), DETAIL_PROJECTION)
         if not car:
             logger.warning(f"Car not found: {id}")
             return jsonify({"error": "Car not found"}), 404
         logger.info(f"Fetched car: {id}")
-        return jsonify(parse_json(car)), 200
+        return json_response(car)
     except Exception as e:
         logger.error(f"Get car error for ID {id}: {str(e)}")
         return jsonify({"error": "Invalid car ID"}), 400
 
 # User profile endpoint
-@app.route("/api/user-profile", methods=["GET"])
+@bp.route("/api/user-profile", methods=["GET"])
 @jwt_required()
 def get_user_profile():
     try:
-        user_email = get_jwt_identity()
-        user = users_collection.find_one({"email": user_email})
-        if not user:
-            logger.warning(f"User not found: {user_email}")
-            return jsonify({"error": "User not found"}), 404
-
-        user_cars = list(cars_collection.find({"seller_email": user_email}))
+        user_email = current_user["email"]
+        user_cars = list(cars_collection.find(live({"seller_email": user_email}), LISTING_PROJECTION))
         user_data = {
-            "fullName": user.get("fullName"),
-            "email": user.get("email"),
-            "contactNumber": user.get("contactNumber", ""),
-            "profilePicture": user.get("profilePicture", ""),
-            "cars": parse_json(user_cars)
+            "fullName": current_user.get("fullName"),
+            "email": current_user.get("email"),
+            "contactNumber": current_user.get("contactNumber", ""),
+            "profilePicture": current_user.get("profilePicture", ""),
+            "cars": user_cars
         }
         logger.info(f"Fetched profile for: {user_email}")
-        return jsonify(user_data), 200
+        return json_response(user_data)
     except Exception as e:
         logger.error(f"Get user profile error for {user_email}: {str(e)}")
         return jsonify({"error": "Failed to fetch profile"}), 500
 
 # Update user details endpoint
-@app.route("/api/update-user", methods=["PUT"])
+@bp.route("/api/update-user", methods=["PUT"])
 @jwt_required()
 def update_user():
     try:
-        user_email = get_jwt_identity()
+        user_email = current_user["email"]
         data = request.form
         update_data = {}
 
@@ -350,27 +723,21 @@ def update_user():
         if "profilePicture" in request.files:
             file = request.files["profilePicture"]
             if file and allowed_file(file.filename):
-                file.seek(0, os.SEEK_END)
-                file_size = file.tell()
-                if file_size > MAX_FILE_SIZE:
+                try:
+                    with timed("file_io"):
+                        upload = image_store.save(file)
+                except UploadError:
                     return jsonify({"error": "Profile picture exceeds 5MB limit"}), 400
-                file.seek(0)
-                filename = f"{uuid.uuid4().hex}.{file.filename.rsplit('.', 1)[1].lower()}"
-                file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                file.save(file_path)
-                update_data["profilePicture"] = f"/uploads/{filename}"
-
-                user = users_collection.find_one({"email": user_email})
-                if user.get("profilePicture") and user["profilePicture"].startswith("/uploads/"):
-                    old_file = user["profilePicture"].split("/")[-1]
-                    old_file_path = os.path.join(app.config["UPLOAD_FOLDER"], old_file)
-                    if os.path.exists(old_file_path):
-                        os.remove(old_file_path)
+                update_data["profilePicture"] = upload["url"]
 
         if not update_data:
             return jsonify({"error": "No valid data provided"}), 400
 
-        users_collection.update_one({"email": user_email}, {"$set": update_data})
+        # A replaced picture is left to the reaper's upload sweep
+        payload = {"id": current_user["_id"], "email": user_email, "set": update_data}
+        if wants_async():
+            return enqueue_write("update_user", payload)
+        job_queue.run_now("update_user", payload)
         logger.info(f"User updated: {user_email}")
         return jsonify({"message": "User details updated successfully"}), 200
     except Exception as e:
@@ -378,12 +745,12 @@ def update_user():
         return jsonify({"error": "Failed to update user details"}), 500
 
 # Update car listing endpoint
-@app.route('/api/update-car/<id>', methods=['PUT'])
+@bp.route('/api/update-car/<id>', methods=['PUT'])
 @jwt_required()
 def update_car(id):
     try:
-        user_email = get_jwt_identity()
-        car = cars_collection.find_one({'_id': ObjectId(id), 'seller_email': user_email})
+        user_email = current_user["email"]
+        car = cars_collection.find_one(live({'_id': ObjectId(id), 'seller_email': user_email}))
         if not car:
             return jsonify({'error': 'Car not found or not authorized'}), 404
 
@@ -406,46 +773,56 @@ def update_car(id):
         if 'category' in update_data and update_data['category'] not in valid_categories:
             return jsonify({'error': f'Invalid category. Must be one of: {", ".join(valid_categories)}'}), 400
 
-        # Handle image uploads
-        new_images = request.files.getlist('images')
+        # Handle image uploads; the replaced images are left to the reaper's
+        # upload sweep once nothing refers to them
+        new_images = [image for image in request.files.getlist('images') if image and image.filename]
         if new_images:
-            # Delete old images
-            for image_path in car.get('images', []):
-                try:
-                    full_path = os.path.join(app.config['UPLOAD_FOLDER'], image_path.lstrip('/uploads/'))
-                    if os.path.exists(full_path):
-                        os.remove(full_path)
-                except Exception as e:
-                    app.logger.error(f"Error deleting image {image_path}: {str(e)}")
-
-            update_data['images'] = []
-            for image in new_images:
-                if image and image.filename:
-                    if not image.mimetype in ['image/png', 'image/jpeg', 'image/gif']:
-                        return jsonify({'error': f'Invalid image type for {image.filename}'}), 400
-                    if image.content_length > 5 * 1024 * 1024:
-                        return jsonify({'error': f'Image {image.filename} exceeds 5MB limit'}), 400
-                    filename = secure_filename(image.filename)
-                    image.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    update_data['images'].append(f'/uploads/{filename}')
+            try:
+                uploads = save_uploads(new_images)
+            except UploadError as e:
+                return jsonify({'error': str(e)}), 400
+            update_data['images'] = [upload['url'] for upload in uploads]
+            update_data['thumbnails'] = [image_store.thumbnail_url(url) for url in update_data['images']]
 
         if not update_data:
             return jsonify({'error': 'No valid data provided'}), 400
 
-        cars_collection.update_one({'_id': ObjectId(id)}, {'$set': update_data})
-        app.logger.info(f"Car updated: {id} by {user_email}")
+        payload = {'id': car['_id'], 'seller_email': user_email, 'set': update_data}
+        if wants_async():
+            return enqueue_write('update_car', payload)
+        job_queue.run_now('update_car', payload)
+        current_app.logger.info(f"Car updated: {id} by {user_email}")
         return jsonify({'message': 'Car updated successfully'}), 200
+    except JobFailed as e:
+        return jsonify({'error': e.message}), e.status
     except ValueError:
         return jsonify({'error': 'Invalid car ID'}), 400
     except Exception as e:
-        app.logger.error(f"Update car error for ID {id}: {str(e)}")
+        current_app.logger.error(f"Update car error for ID {id}: {str(e)}")
         return jsonify({'error': 'Failed to update car'}), 500
+# Status of a queued listing or profile write; the result, once done, is
+# what the synchronous request would have returned
+@bp.route("/api/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_job(job_id):
+    try:
+        job = job_queue.status(job_id, str(current_user["_id"]))
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        response = json_response(job)
+        if job["status"] in ("queued", "running"):
+            response.headers["Retry-After"] = "1"
+        return response
+    except Exception as e:
+        logger.error(f"Get job error for {job_id}: {str(e)}")
+        return jsonify({"error": "Failed to fetch job"}), 500
+
 # Change password endpoint
-@app.route("/api/change-password", methods=["PUT"])
+@bp.route("/api/change-password", methods=["PUT"])
 @jwt_required()
 def change_password():
     try:
-        user_email = get_jwt_identity()
+        user_email = current_user["email"]
         data = request.get_json()
         current_password = data.get("currentPassword")
         new_password = data.get("newPassword")
@@ -456,125 +833,253 @@ def change_password():
         if len(new_password) < 8:
             return jsonify({"error": "New password must be at least 8 characters long"}), 400
 
-        user = users_collection.find_one({"email": user_email})
-        if not user or not bcrypt.checkpw(current_password.encode("utf-8"), user["password"]):
+        user = users_collection.find_one({"_id": current_user["_id"]}, {"password": 1})
+        if not user or not password_hasher.verify(current_password, user["password"]):
             logger.warning(f"Invalid password change attempt by: {user_email}")
             return jsonify({"error": "Current password is incorrect"}), 401
 
-        hashed_password = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt())
-        users_collection.update_one({"email": user_email}, {"$set": {"password": hashed_password}})
+        hashed_password = password_hasher.hash(new_password)
+        users_collection.update_one({"_id": user["_id"]}, {"$set": {"password": hashed_password}})
+        forget_user(current_user)
         logger.info(f"Password changed for: {user_email}")
         return jsonify({"message": "Password changed successfully"}), 200
+    except PasswordPoolBusy:
+        return too_many_requests()
     except Exception as e:
         logger.error(f"Change password error for {user_email}: {str(e)}")
         return jsonify({"error": "Failed to change password"}), 500
 
 # Delete car listing endpoint
-@app.route('/api/delete-car/<id>', methods=['DELETE'])
+@bp.route('/api/delete-car/<id>', methods=['DELETE'])
 @jwt_required()
 def delete_car(id):
     try:
-        user_email = get_jwt_identity()
-        car = cars_collection.find_one({'_id': ObjectId(id), 'seller_email': user_email})
+        user_email = current_user["email"]
+        car = cars_collection.find_one(live({'_id': ObjectId(id), 'seller_email': user_email}))
         if not car:
             return jsonify({'error': 'Car not found or not authorized'}), 404
 
-        # Delete associated images
-        for image_path in car.get('images', []):
-            try:
-                full_path = os.path.join(app.config['UPLOAD_FOLDER'], image_path.lstrip('/uploads/'))
-                if os.path.exists(full_path):
-                    os.remove(full_path)
-            except Exception as e:
-                app.logger.error(f"Error deleting image {image_path}: {str(e)}")
-
-        # Delete the car from the database
-        cars_collection.delete_one({'_id': ObjectId(id)})
-        app.logger.info(f"Car deleted: {id} by {user_email}")
+        # Tombstone the car; the reaper removes it and its unused images
+        if cars_collection.update_one(live({'_id': ObjectId(id)}), {'$set': tombstone()}).modified_count:
+            record_removed(car_stats_collection, [car])
+        response_cache.invalidate('cars', 'categories')
+        current_app.logger.info(f"Car deleted: {id} by {user_email}")
         return jsonify({'message': 'Car deleted successfully'}), 200
     except Exception as e:
-        app.logger.error(f"Delete car error for ID {id}: {str(e)}")
+        current_app.logger.error(f"Delete car error for ID {id}: {str(e)}")
         return jsonify({'error': 'Failed to delete car'}), 500
 # Delete account endpoint
-@app.route("/api/delete-account", methods=["DELETE"])
+@bp.route("/api/delete-account", methods=["DELETE"])
 @jwt_required()
 def delete_account():
     try:
-        user_email = get_jwt_identity()
-        user = users_collection.find_one({"email": user_email})
-        if not user:
-            logger.warning(f"User not found for deletion: {user_email}")
-            return jsonify({"error": "User not found"}), 404
-
-        user_cars = cars_collection.find({"seller_email": user_email})
-        for car in user_cars:
-            for image_url in car.get("images", []):
-                if image_url.startswith("/uploads/"):
-                    filename = image_url.split("/")[-1]
-                    file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-        cars_collection.delete_many({"seller_email": user_email})
-
-        if user.get("profilePicture") and user["profilePicture"].startswith("/uploads/"):
-            filename = user["profilePicture"].split("/")[-1]
-            file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-
-        users_collection.delete_one({"email": user_email})
+        user_email = current_user["email"]
+
+        # One update hides every listing; the stats are adjusted from the
+        # cars it tombstoned, and the reaper removes them and their images
+        # (the profile picture goes with the next upload sweep)
+        marker = tombstone()
+        deleted = cars_collection.update_many(live({"seller_email": user_email}), {"$set": marker})
+        if deleted.modified_count:
+            record_removed(car_stats_collection, cars_collection.find(
+                {"seller_email": user_email, "deletedAt": marker["deletedAt"]}, {"category": 1, "price": 1}))
+            response_cache.invalidate("cars", "categories")
+
+        users_collection.delete_one({"_id": current_user["_id"]})
+        forget_user(current_user)
         logger.info(f"Account deleted: {user_email}")
         return jsonify({"message": "Account and associated cars deleted successfully"}), 200
     except Exception as e:
         logger.error(f"Delete account error for {user_email}: {str(e)}")
         return jsonify({"error": "Failed to delete account"}), 500
 
+# Class probabilities for one encoded record, through the prediction
+# cache and the micro-batcher
+def predict_one(bundle, X):
+    cache_key = (bundle.version, tuple(X[0].tolist()))
+    proba = prediction_cache.get(cache_key)
+    if proba is None:
+        # Copy so the cache does not pin the whole coalesced batch array
+        with timed("model"):
+            proba = bundle.batcher.predict(X, timeout=PREDICT_TIMEOUT).copy()
+        prediction_cache.set(cache_key, proba)
+    return proba
+
 # Car recommendation endpoint
-@app.route("/predict", methods=["POST"])
+@bp.route("/predict", methods=["POST"])
 def predict():
     try:
         data = request.get_json()
         if not data:
             return jsonify({"error": "No input data provided"}), 400
 
-        required_fields = [
-            "Price", "Model Year", "Engine Type", "Engine Capacity",
-            "Assembly", "Body Type", "Transmission Type", "Registration Status"
-        ]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"{field} is required"}), 400
+        bundle = model_registry.current
+        try:
+            with timed("encode"):
+                X = bundle.predictor.encoder.encode_one(data)
+            top_k = parse_top_k(data)
+        except FeatureEncodingError as e:
+            return jsonify({"error": e.message}), 400
+        except (ValueError, TypeError):
+            return jsonify({"error": "top_k must be a positive integer"}), 400
+
+        proba = predict_one(bundle, X)
+        with timed("decode"):
+            car_name = str(bundle.predictor.decode(proba)[0])
+        logger.info(f"Prediction made: {car_name} (model {bundle.version})")
+        response = {"car_name": car_name, "model_version": bundle.version}
+        if top_k:
+            response["recommendations"] = bundle.predictor.top_k(proba, top_k)[0]
+        return jsonify(response), 200
+    except Exception as e:
+        logger.error(f"Prediction error: {str(e)}")
+        return jsonify({"error": "Prediction failed. Please try again."}), 500
 
-        numeric_fields = ["Price", "Model Year", "Engine Capacity"]
-        for field in numeric_fields:
-            try:
-                data[field] = float(data[field])
-            except (ValueError, TypeError):
-                return jsonify({"error": f"{field} must be a number"}), 400
-
-        categorical_mappings = {
-            "Engine Type": ["Petrol", "Diesel", "Hybrid"],
-            "Assembly": ["Local", "Imported"],
-            "Body Type": ["Hatchback", "Sedan", "SUV", "Cross Over", "Van", "Mini Van"],
-            "Transmission Type": ["Manual", "Automatic"],
-            "Registration Status": ["Registered", "Un-Registered"]
-        }
+# Batch car recommendation endpoint
+@bp.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    try:
+        data = request.get_json()
+        records = data.get("records") if isinstance(data, dict) else data
+        if not records or not isinstance(records, list):
+            return jsonify({"error": "A non-empty list of records is required"}), 400
+        if len(records) > MAX_PREDICT_BATCH:
+            return jsonify({"error": f"At most {MAX_PREDICT_BATCH} records per batch"}), 400
 
-        encoded_data = data.copy()
-        for col, categories in categorical_mappings.items():
-            try:
-                encoded_data[col] = categories.index(data[col])
-            except ValueError:
-                return jsonify({"error": f"Invalid value for {col}. Expected one of: {categories}"}), 400
-
-        input_df = pd.DataFrame([encoded_data], columns=required_fields)
-        prediction = model.predict(input_df)[0]
-        car_name = car_name_encoder.inverse_transform([prediction])[0]
-        logger.info(f"Prediction made: {car_name}")
-        return jsonify({"car_name": car_name}), 200
+        bundle = model_registry.current
+        try:
+            with timed("encode"):
+                X = bundle.predictor.encoder.encode(records)
+            top_k = parse_top_k(data)
+        except FeatureEncodingError as e:
+            return jsonify({"error": e.message, "index": e.index}), 400
+        except (ValueError, TypeError):
+            return jsonify({"error": "top_k must be a positive integer"}), 400
+
+        with timed("model"):
+            proba = bundle.predictor.predict_proba(X)
+        with timed("decode"):
+            car_names = bundle.predictor.decode(proba).tolist()
+        logger.info(f"Batch prediction made for {len(car_names)} records (model {bundle.version})")
+        response = {"car_names": car_names, "model_version": bundle.version}
+        if top_k:
+            response["recommendations"] = bundle.predictor.top_k(proba, top_k)
+        return jsonify(response), 200
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}")
+        logger.error(f"Batch prediction error: {str(e)}")
         return jsonify({"error": "Prediction failed. Please try again."}), 500
 
+# Recommended cars that can be bought: the top_k predicted models, each
+# with up to limit live listings in the price band, closest to the record's
+# Price first. The band is Price +/- priceBand unless minPrice/maxPrice are
+# given; category and featured filter as on /api/cars. Every model costs
+# two bounded index scans on model_key_price__id.
+@bp.route("/api/recommendations", methods=["POST"])
+def recommend_cars():
+    try:
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data, dict):
+            return jsonify({"error": "No input data provided"}), 400
+
+        bundle = model_registry.current
+        try:
+            with timed("encode"):
+                X = bundle.predictor.encoder.encode_one(data)
+            top_k = min(parse_top_k(data) or 3, MAX_RECOMMENDED_MODELS)
+            limit = min(int(data.get("limit", request.args.get("limit", 3))), MAX_LISTINGS_PER_MODEL)
+            band = float(data.get("priceBand", request.args.get("priceBand", RECOMMENDATION_PRICE_BAND)))
+            query = build_car_filter({k: v for k, v in request.args.items() if k != "name"})
+            budget = float(data["Price"])
+            if limit < 1 or band < 0:
+                raise ValueError("limit and priceBand must not be negative")
+        except FeatureEncodingError as e:
+            return jsonify({"error": e.message}), 400
+        except (KeyError, ValueError, TypeError):
+            return jsonify({"error": "Invalid recommendation parameters"}), 400
+
+        price = query.setdefault("price", {})
+        price.setdefault("$gte", budget * (1 - band))
+        price.setdefault("$lte", budget * (1 + band))
+
+        proba = predict_one(bundle, X)
+        with timed("decode"):
+            ranked = bundle.predictor.top_k(proba, top_k)[0]
+        for entry in ranked:
+            entry["cars"] = nearest_listings(cars_collection, query, entry["car_name"], budget,
+                                             limit, LISTING_PROJECTION)
+        logger.info(f"Recommendations made: {[entry['car_name'] for entry in ranked]} (model {bundle.version})")
+        return json_response({
+            "model_version": bundle.version,
+            "priceBand": {"min": price["$gte"], "max": price["$lte"]},
+            "recommendations": ranked
+        })
+    except Exception as e:
+        logger.error(f"Recommendation error: {str(e)}")
+        return jsonify({"error": "Recommendation failed. Please try again."}), 500
+
+# Inference batching metrics endpoint
+@bp.route("/predict/stats", methods=["GET"])
+def predict_stats():
+    bundle = model_registry.current
+    stats = bundle.batcher.stats()
+    stats["model_version"] = bundle.version
+    stats["cache"] = prediction_cache.stats()
+    return jsonify(stats), 200
+
+# Hit rates of this worker's read caches
+@bp.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "responses": response_cache.stats(),
+        "listing_counts": car_count_cache.stats(),
+        "users": user_cache.stats()
+    }), 200
+
+# Prometheus scrape endpoint
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return jsonify({"error": "Not authorized"}), 403
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+def admin_authorized():
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+# Model registry admin endpoints
+@bp.route("/api/admin/models", methods=["GET"])
+def model_status():
+    if not admin_authorized():
+        return jsonify({"error": "Not authorized"}), 403
+    return jsonify(model_registry.status()), 200
+
+@bp.route("/api/admin/models/reload", methods=["POST"])
+def reload_model():
+    if not admin_authorized():
+        return jsonify({"error": "Not authorized"}), 403
+    wait = request.args.get("wait") == "true"
+    model_registry.reload(wait=wait)
+    logger.info("Model reload requested")
+    if wait:
+        return jsonify(model_registry.status()), 200
+    return jsonify({"message": "Model reload started", "current": model_registry.current.describe()}), 202
+
+@bp.route("/api/admin/models/rollback", methods=["POST"])
+def rollback_model():
+    if not admin_authorized():
+        return jsonify({"error": "Not authorized"}), 403
+    bundle = model_registry.rollback()
+    if bundle is None:
+        return jsonify({"error": "No previous model version to roll back to"}), 409
+    logger.info(f"Model rolled back to {bundle.version}")
+    return jsonify(model_registry.status()), 200
+
+# Development server; see gunicorn.conf.py for production
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app = create_app()
+    services = app.extensions["drivewise"]
+    services.start()
+    try:
+        app.run(debug=True, port=5000)
+    finally:
+        services.shutdown()
\ No newline at end of file
@@ -0,0 +1,250 @@
+# Async serving path for the read-heavy listing endpoints:
+#
+#   GET /api/cars   GET /api/cars/<id>   GET /api/categories   GET /api/user-profile
+#
+# A plain ASGI app on pymongo's AsyncMongoClient, so a slow query parks a
+# coroutine instead of a worker thread, and independent queries (a page and
+# its count) run concurrently; users come from a short-TTL cache keyed by
+# the token identity, like the Flask app. Responses match
+# the Flask endpoints in app.py, which keep serving everything else. Run it
+# next to gunicorn and route these paths to it (send /api/cars/suggest,
+# /api/cars/facets, /api/cars/import and /api/cars/export to Flask), from
+# backend/:
+#
+#   uvicorn async_api:app --workers 4 --port 5001
+import asyncio
+import json
+import logging
+import os
+from urllib.parse import parse_qsl
+
+import jwt
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient
+
+from car_queries import car_page_payload, live, plan_car_page
+from mongo import pool_options_from_env
+from prediction_cache import TTLCache
+from serialization import DETAIL_PROJECTION, LISTING_PROJECTION, dumps
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+MAX_PAGE_SIZE = 100
+CORS_ORIGIN = os.getenv("CORS_ORIGIN", "http://localhost:3000")
+# Paths under /api/cars/ that are Flask endpoints, not car ids
+FLASK_CAR_PATHS = {"suggest", "facets", "import", "export"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, body):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+
+
+class AsyncListingsApp:
+    def __init__(self, uri, db_name="drivewise", jwt_secret="your-secret-key",
+                 count_cache_ttl=30, user_cache_ttl=30, **client_options):
+        self.uri = uri
+        self.db_name = db_name
+        self.jwt_secret = jwt_secret
+        self.client_options = client_options
+        self.car_count_cache = TTLCache(maxsize=1024, ttl=count_cache_ttl)
+        self.user_cache = TTLCache(maxsize=10000, ttl=user_cache_ttl)
+        self._client = None
+        self.routes = {
+            "/api/cars": self.get_cars,
+            "/api/categories": self.get_category_counts,
+            "/api/user-profile": self.get_user_profile,
+        }
+
+    # The client binds to the running event loop, so it is created inside
+    # the server process (lifespan startup or first request), never at import
+    @property
+    def db(self):
+        if self._client is None:
+            self._client = AsyncMongoClient(self.uri, **self.client_options)
+        return self._client[self.db_name]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            status, body, headers = await self.dispatch(scope)
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.db
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def dispatch(self, scope):
+        headers = [(b"access-control-allow-origin", CORS_ORIGIN.encode("latin-1")), (b"vary", b"Origin")]
+        if scope["method"] == "OPTIONS":
+            headers += [(b"access-control-allow-methods", b"GET, OPTIONS"),
+                        (b"access-control-allow-headers", b"Authorization, Content-Type")]
+            return 204, b"", headers
+
+        path = scope["path"].rstrip("/") or "/"
+        handler, params = self.routes.get(path), ()
+        if handler is None and path.startswith("/api/cars/") and path.count("/") == 3:
+            car_id = path.rsplit("/", 1)[1]
+            if car_id not in FLASK_CAR_PATHS:
+                handler, params = self.get_car, (car_id,)
+        try:
+            if handler is None:
+                raise HTTPError(404, {"error": "Not found"})
+            if scope["method"] not in ("GET", "HEAD"):
+                raise HTTPError(405, {"error": "Method not allowed"})
+            request = {
+                "args": query_args(scope.get("query_string", b"")),
+                "headers": {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])},
+            }
+            status, body = 200, await handler(request, *params)
+        except HTTPError as e:
+            status, body = e.status, e.body
+        except Exception as e:
+            logger.error(f"Unhandled error for {path}: {str(e)}")
+            status, body = 500, {"error": "Internal server error"}
+        headers.append((b"content-type", b"application/json"))
+        payload = dumps(body)
+        headers.append((b"content-length", str(len(payload)).encode("ascii")))
+        return status, b"" if scope["method"] == "HEAD" else payload, headers
+
+    def claims(self, request):
+        auth = request["headers"].get("authorization", "")
+        if not auth.startswith("Bearer "):
+            raise HTTPError(401, {"msg": "Missing Authorization Header"})
+        try:
+            claims = jwt.decode(auth[7:], self.jwt_secret, algorithms=["HS256"])
+        except jwt.ExpiredSignatureError:
+            raise HTTPError(401, {"msg": "Token has expired"})
+        except jwt.InvalidTokenError as e:
+            raise HTTPError(422, {"msg": str(e)})
+        if claims.get("type") != "access" or "sub" not in claims:
+            raise HTTPError(422, {"msg": "Only access tokens are allowed"})
+        return claims
+
+    async def get_cars(self, request):
+        try:
+            plan = plan_car_page(request["args"], MAX_PAGE_SIZE)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Invalid query parameters: {str(e)}")
+            raise HTTPError(400, {"error": "Invalid query parameters"})
+        cars_collection = self.db["cars"]
+        query, limit = plan["query"], plan["limit"]
+        try:
+            # The page and its total are independent; fetch them together
+            page = cars_collection.find(plan["find_query"], LISTING_PROJECTION) \
+                .sort(plan["sort"]).skip(plan["skip"]).limit(limit + 1).to_list(None)
+            count_key = json.dumps(query, sort_keys=True, default=str)
+            total_cars = self.car_count_cache.get(count_key)
+            if total_cars is None:
+                count = cars_collection.count_documents(live(query)) if query else self.listing_count()
+                cars, total_cars = await asyncio.gather(page, count)
+                self.car_count_cache.set(count_key, total_cars)
+            else:
+                cars = await page
+        except Exception as e:
+            logger.error(f"Get cars error: {str(e)}")
+            raise HTTPError(500, {"error": "Failed to fetch cars"})
+        return car_page_payload(plan, cars, total_cars)
+
+    # Live total from the stats documents, as car_stats.listing_count()
+    async def listing_count(self):
+        docs = await self.db["car_stats"].find({"count": {"$gt": 0}}, {"count": 1}).to_list(None)
+        return sum(doc["count"] for doc in docs)
+
+    async def get_car(self, request, id):
+        try:
+            car = await self.db["cars"].find_one(live({"_id": ObjectId(id)}), DETAIL_PROJECTION)
+        except Exception as e:
+            logger.error(f"Get car error for ID {id}: {str(e)}")
+            raise HTTPError(400, {"error": "Invalid car ID"})
+        if not car:
+            logger.warning(f"Car not found: {id}")
+            raise HTTPError(404, {"error": "Car not found"})
+        return car
+
+    async def get_category_counts(self, request):
+        try:
+            docs = await self.db["car_stats"].find({"count": {"$gt": 0}}, {"count": 1}).to_list(None)
+        except Exception as e:
+            logger.error(f"Get categories error: {str(e)}")
+            raise HTTPError(500, {"error": "Failed to fetch categories"})
+        return [{"name": doc["_id"], "count": doc["count"]} for doc in docs]
+
+    # The token's user without the password hash, as app.load_user()
+    async def load_user(self, identity):
+        user = self.user_cache.get(identity)
+        if user is None:
+            query = {"_id": ObjectId(identity)} if ObjectId.is_valid(identity) else {"email": identity}
+            user = await self.db["users"].find_one(query, {"password": 0})
+            if user is not None:
+                self.user_cache.set(identity, user)
+        return user
+
+    # The user and their listings are fetched concurrently; both are keyed
+    # by the email, which tokens carry as a claim (older tokens have it as
+    # the identity itself, or not at all and wait for the user)
+    async def get_user_profile(self, request):
+        claims = self.claims(request)
+        identity = claims["sub"]
+        email = claims.get("email") or (None if ObjectId.is_valid(identity) else identity)
+        try:
+            if email:
+                user, user_cars = await asyncio.gather(
+                    self.load_user(identity),
+                    self.db["cars"].find(live({"seller_email": email}), LISTING_PROJECTION).to_list(None)
+                )
+            else:
+                user = await self.load_user(identity)
+                user_cars = None
+                if user:
+                    user_cars = await self.db["cars"].find(live({"seller_email": user["email"]}),
+                                                           LISTING_PROJECTION).to_list(None)
+        except Exception as e:
+            logger.error(f"Get user profile error for {identity}: {str(e)}")
+            raise HTTPError(500, {"error": "Failed to fetch profile"})
+        if not user:
+            logger.warning(f"User not found: {identity}")
+            raise HTTPError(404, {"error": "User not found"})
+        return {
+            "fullName": user.get("fullName"),
+            "email": user.get("email"),
+            "contactNumber": user.get("contactNumber", ""),
+            "profilePicture": user.get("profilePicture", ""),
+            "cars": user_cars
+        }
+
+
+# First value wins for repeated keys, like Flask's request.args.get()
+def query_args(query_string):
+    args = {}
+    for key, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
+        args.setdefault(key, value)
+    return args
+
+
+app = AsyncListingsApp(
+    os.getenv("MONGO_URI", "mongodb://localhost:27017"),
+    jwt_secret=os.getenv("JWT_SECRET_KEY", "your-secret-key"),
+    count_cache_ttl=float(os.getenv("CAR_COUNT_CACHE_TTL", 30)),
+    user_cache_ttl=float(os.getenv("USER_CACHE_TTL", 30)),
+    **pool_options_from_env()
+)
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# Batch-size histogram buckets (upper bounds, rows per model call)
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class _Pending:
+    __slots__ = ("X", "future", "enqueued_at")
+
+    def __init__(self, X):
+        self.X = X
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceBatcher:
+    # Coalesces concurrent predict calls: requests are held for at most
+    # max_wait seconds (or until max_batch_size rows are queued), run through
+    # predict_fn as one matrix, and each caller gets back its own rows.
+    def __init__(self, predict_fn, max_batch_size=64, max_wait=0.002, latency_window=2048):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = deque()
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._latencies = deque(maxlen=latency_window)
+        self._histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._batches = 0
+        self._rows = 0
+
+    def submit(self, X):
+        item = _Pending(X)
+        with self._cond:
+            closed = self._closed
+            if not closed:
+                self._ensure_worker()
+                self._pending.append(item)
+                self._pending_rows += len(X)
+                self._cond.notify()
+        if closed:
+            # A retired batcher (e.g. a replaced model) still answers callers
+            # that picked it up just before the swap, without batching
+            item.future.set_result(self.predict_fn(X))
+        return item.future
+
+    def predict(self, X, timeout=None):
+        return self.submit(X).result(timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            latencies = np.array(self._latencies) if self._latencies else None
+            histogram = list(self._histogram)
+            stats = {
+                "queue_depth": len(self._pending),
+                "queued_rows": self._pending_rows,
+                "batches": self._batches,
+                "rows": self._rows,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+        labels = [f"<={b}" for b in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        stats["batch_size_histogram"] = dict(zip(labels, histogram))
+        stats["mean_batch_size"] = stats["rows"] / stats["batches"] if stats["batches"] else 0.0
+        if latencies is None:
+            stats["latency_ms"] = {"p50": None, "p99": None}
+        else:
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            stats["latency_ms"] = {"p50": round(float(p50), 3), "p99": round(float(p99), 3)}
+        return stats
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so a forked worker starts its own
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            deadline = self._pending[0].enqueued_at + self.max_wait
+            while self._pending_rows < self.max_batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, rows = [], 0
+            while self._pending and (not batch or rows + len(self._pending[0].X) <= self.max_batch_size):
+                item = self._pending.popleft()
+                batch.append(item)
+                rows += len(item.X)
+            self._pending_rows -= rows
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                X = batch[0].X if len(batch) == 1 else np.concatenate([item.X for item in batch])
+                results = self.predict_fn(X)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            offset = 0
+            for item in batch:
+                item.future.set_result(results[offset:offset + len(item.X)])
+                offset += len(item.X)
+            self._record(batch, offset)
+
+    def _record(self, batch, rows):
+        done = time.perf_counter()
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if rows <= bound), len(BATCH_SIZE_BUCKETS))
+        with self._cond:
+            self._batches += 1
+            self._rows += rows
+            self._histogram[bucket] += 1
+            self._latencies.extend(done - item.enqueued_at for item in batch)
@@ -0,0 +1,129 @@
+# High-concurrency read benchmark against a local mongod: the async
+# listings app (async_api) serving N concurrent /api/cars and
+# /api/user-profile requests on one event loop, versus the blocking
+# pattern of the Flask handlers -- page query then count, user then
+# listings -- on a fixed pool of worker threads (a gunicorn gthread worker).
+#
+# Run from backend/:  python -m benchmarks.bench_async [--uri mongodb://localhost:27017] [--concurrency 16,64,256]
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import numpy as np
+from pymongo import MongoClient
+
+from async_api import AsyncListingsApp
+from car_queries import car_page_payload, live, plan_car_page
+from car_stats import listing_count, reconcile
+from indexes import ensure_indexes
+from serialization import LISTING_PROJECTION, dumps
+from benchmarks.synthetic import synthetic_listings
+
+BENCH_DB = "drivewise_async_bench"
+SECRET = "bench-secret"
+REQUESTS = [
+    ("/api/cars", b"limit=9"),
+    ("/api/cars", b"limit=9&category=SUVs&sort=year-desc"),
+    ("/api/cars", b"limit=9&minPrice=1000000&maxPrice=3000000&page=3"),
+    ("/api/user-profile", b""),
+]
+
+
+def seed(db, n):
+    listings = synthetic_listings(n)
+    for car in listings:
+        car["seller_email"] = "dealer@example.com" if car["featured"] else car["seller_email"]
+    db["cars"].insert_many(listings, ordered=False)
+    reconcile(db["cars"], db["car_stats"])
+    db["users"].insert_one({"email": "dealer@example.com", "fullName": "Dealer", "password": b""})
+
+
+def sync_request(db, path, query_string):
+    if path == "/api/user-profile":
+        user = db["users"].find_one({"email": "dealer@example.com"})
+        cars = list(db["cars"].find(live({"seller_email": user["email"]}), LISTING_PROJECTION))
+        return dumps({"fullName": user["fullName"], "cars": cars})
+    args = dict(pair.split("=") for pair in query_string.decode().split("&"))
+    plan = plan_car_page(args, 100)
+    cars = list(db["cars"].find(plan["find_query"], LISTING_PROJECTION)
+                .sort(plan["sort"]).skip(plan["skip"]).limit(plan["limit"] + 1))
+    total = db["cars"].count_documents(live(plan["query"])) if plan["query"] else listing_count(db["car_stats"])
+    return dumps(car_page_payload(plan, cars, total))
+
+
+def run_sync(db, concurrency, total, threads):
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        sync_request(db, *REQUESTS[i % len(REQUESTS)])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    # Requests beyond the thread count queue, as they would in gunicorn
+    with ThreadPoolExecutor(max_workers=min(threads, concurrency)) as pool:
+        list(pool.map(one, range(total)))
+    return total / (time.perf_counter() - start), np.array(latencies) * 1e3
+
+
+async def run_async(app, concurrency, total, token):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    async def one(i):
+        path, query_string = REQUESTS[i % len(REQUESTS)]
+        async with semaphore:
+            start = time.perf_counter()
+            status, _, _ = await app.dispatch({"type": "http", "method": "GET", "path": path,
+                                               "query_string": query_string, "headers": headers})
+            latencies.append(time.perf_counter() - start)
+            assert status == 200, status
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start), np.array(latencies) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--concurrency", default="16,64,256")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri, maxPoolSize=args.threads)
+    client.drop_database(BENCH_DB)
+    db = client[BENCH_DB]
+    ensure_indexes(db)
+    seed(db, args.listings)
+    token = jwt.encode({"sub": "dealer@example.com", "type": "access", "exp": int(time.time()) + 3600},
+                       SECRET, algorithm="HS256")
+
+    print(f"{'concurrency':>11} {'mode':<18} {'req/sec':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            rate, latencies = run_sync(db, concurrency, args.requests, args.threads)
+            print(f"{concurrency:>11} {f'threads ({args.threads})':<18} {rate:>9,.0f} "
+                  f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f}")
+
+            async def run():
+                app = AsyncListingsApp(args.uri, db_name=BENCH_DB, jwt_secret=SECRET, count_cache_ttl=0,
+                                       maxPoolSize=concurrency)
+                try:
+                    return await run_async(app, concurrency, args.requests, token)
+                finally:
+                    await app.close()
+            rate, latencies = asyncio.run(run())
+            print(f"{concurrency:>11} {'asyncio':<18} {rate:>9,.0f} "
+                  f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f}")
+    finally:
+        client.drop_database(BENCH_DB)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Concurrency benchmark for request coalescing: N client threads each score
+# one row at a time, either straight through the model or via the
+# InferenceBatcher, for a few window sizes.
+#
+# Run from backend/:  python -m benchmarks.bench_batching [--clients 32] [--requests 2000]
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batching import InferenceBatcher
+from inference import CarPredictor
+from benchmarks.bench_predict import load_or_train
+from benchmarks.synthetic import synthetic_records
+
+
+def drive(call, rows, clients):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(call, rows))
+    return len(rows) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--windows", default="0.5,2,5")
+    parser.add_argument("--max-rows", type=int, default=64)
+    args = parser.parse_args()
+
+    model, label_encoder = load_or_train()
+    predictor = CarPredictor(model, label_encoder)
+    X = predictor.encoder.encode(synthetic_records(args.requests))
+    rows = [X[i:i + 1] for i in range(len(X))]
+
+    rate = drive(predictor.predict_proba, rows, args.clients)
+    print(f"unbatched: {rate:,.0f} req/sec")
+    for window_ms in [float(w) for w in args.windows.split(",")]:
+        batcher = InferenceBatcher(predictor.predict_proba, max_batch_size=args.max_rows,
+                                   max_wait=window_ms / 1000)
+        rate = drive(lambda row: batcher.predict(row), rows, args.clients)
+        stats = batcher.stats()
+        batcher.close()
+        print(f"window {window_ms}ms: {rate:,.0f} req/sec, "
+              f"mean batch {stats['mean_batch_size']:.1f}, latency {json.dumps(stats['latency_ms'])}")
+
+
+if __name__ == "__main__":
+    main()
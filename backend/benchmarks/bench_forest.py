@@ -0,0 +1,58 @@
+# Compares the pickled sklearn forest with the compiled, memory-mapped one:
+# load time, file size, per-batch latency and agreement of predictions.
+#
+# Run from backend/:  python -m benchmarks.bench_forest [--sizes 1,10,100,1000]
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from forest_compiler import export_forest, load_compiled_forest
+from inference import FeatureEncoder
+from benchmarks.bench_predict import load_or_train, timed
+from benchmarks.synthetic import synthetic_records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,10,100,1000")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    model, _ = load_or_train()
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl_path = os.path.join(tmp, "model.pkl")
+        forest_path = os.path.join(tmp, "model.forest")
+        joblib.dump(model, pkl_path)
+        export_forest(model, forest_path)
+
+        start = time.perf_counter()
+        sk_model = joblib.load(pkl_path)
+        sk_load = time.perf_counter() - start
+        start = time.perf_counter()
+        forest = load_compiled_forest(forest_path)
+        forest_load = time.perf_counter() - start
+        print(f"load: joblib {sk_load * 1e3:.1f} ms ({os.path.getsize(pkl_path) / 1e6:.1f} MB), "
+              f"compiled {forest_load * 1e3:.2f} ms ({os.path.getsize(forest_path) / 1e6:.1f} MB)")
+
+        # Both predictors see the same ndarray input
+        if hasattr(sk_model, "feature_names_in_"):
+            del sk_model.feature_names_in_
+        X = FeatureEncoder().encode(synthetic_records(max(sizes), seed=1))
+        agreement = (sk_model.predict(X) == forest.predict(X)).mean()
+        print(f"prediction agreement: {agreement:.4%}, "
+              f"max proba diff {np.abs(sk_model.predict_proba(X) - forest.predict_proba(X)).max():.2e}")
+
+        print(f"{'batch':>8} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8}")
+        for size in sizes:
+            batch = X[:size]
+            sk = timed(lambda: sk_model.predict_proba(batch))
+            compiled = timed(lambda: forest.predict_proba(batch))
+            print(f"{size:>8} {sk * 1e3:>11.3f} {compiled * 1e3:>12.3f} {sk / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
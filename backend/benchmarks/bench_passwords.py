@@ -0,0 +1,73 @@
+# Login storm benchmark: bcrypt verify throughput, and the latency of a
+# light "browse" request (serializing a page of listings) while logins run
+# on other threads, with bcrypt inline versus in the process pool.
+#
+# Run from backend/:  python -m benchmarks.bench_passwords [--rounds 10,12] [--threads 16]
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from passwords import PasswordHasher, PasswordPoolBusy
+from serialization import dumps
+from benchmarks.synthetic import synthetic_listings
+
+
+def browse_latencies(page, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        dumps({"cars": page})
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.005)
+    return np.array(latencies) * 1e3
+
+
+def storm(hasher, hashed, threads, duration, page):
+    counts, rejected = [0] * threads, [0] * threads
+    stop = threading.Event()
+
+    def login(i):
+        while not stop.is_set():
+            try:
+                hasher.verify("correct horse battery", hashed)
+                counts[i] += 1
+            except PasswordPoolBusy:
+                rejected[i] += 1
+                time.sleep(0.01)
+
+    workers = [threading.Thread(target=login, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    latencies = browse_latencies(page, duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / duration, sum(rejected), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", default="10,12")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    page = synthetic_listings(9)
+    idle = browse_latencies(page, 1)
+    print(f"browse latency without logins: p50 {np.percentile(idle, 50):.2f} ms, p99 {np.percentile(idle, 99):.2f} ms")
+    print(f"{'rounds':>6} {'mode':<7} {'logins/sec':>11} {'429s':>6} {'browse p50 ms':>14} {'browse p99 ms':>14}")
+    for rounds in (int(r) for r in args.rounds.split(",")):
+        hashed = PasswordHasher(rounds=rounds, workers=0).hash("correct horse battery")
+        for mode, workers in (("inline", 0), ("pool", None)):
+            hasher = PasswordHasher(rounds=rounds, workers=workers, max_pending=args.threads if workers == 0 else None)
+            rate, rejected, latencies = storm(hasher, hashed, args.threads, args.seconds, page)
+            hasher.close()
+            print(f"{rounds:>6} {mode:<7} {rate:>11.1f} {rejected:>6} "
+                  f"{np.percentile(latencies, 50):>14.2f} {np.percentile(latencies, 99):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Micro-benchmark for the prediction path: rows/sec of the array encoder +
+# single predict_proba call versus the old one-row DataFrame path.
+#
+# Run from backend/:  python -m benchmarks.bench_predict [--sizes 1,10,100,1000,10000]
+import argparse
+import os
+import time
+
+import joblib
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from inference import CATEGORICAL_MAPPINGS, FEATURE_COLUMNS, CarPredictor
+from benchmarks.synthetic import synthetic_dataset, synthetic_records
+
+MODEL_PATH = os.path.join(os.getcwd(), "models", "random_forest_model.pkl")
+ENCODER_PATH = os.path.join(os.getcwd(), "models", "car_name_label_encoder.pkl")
+
+
+def load_or_train():
+    if os.path.exists(MODEL_PATH) and os.path.exists(ENCODER_PATH):
+        return joblib.load(MODEL_PATH), joblib.load(ENCODER_PATH)
+    print("No trained model found, fitting one on synthetic data")
+    df = synthetic_dataset(20000)
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(df.pop("Car Name"))
+    for col, values in CATEGORICAL_MAPPINGS.items():
+        df[col] = df[col].map({v: i for i, v in enumerate(values)})
+    model = RandomForestClassifier(n_estimators=50, max_depth=50, min_samples_split=16, random_state=100)
+    model.fit(df[FEATURE_COLUMNS], y)
+    return model, label_encoder
+
+
+def legacy_predict(model, label_encoder, record):
+    encoded = dict(record)
+    for col, categories in CATEGORICAL_MAPPINGS.items():
+        encoded[col] = categories.index(record[col])
+    input_df = pd.DataFrame([encoded], columns=FEATURE_COLUMNS)
+    return label_encoder.inverse_transform(model.predict(input_df))[0]
+
+
+def timed(fn, min_time=0.5):
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,10,100,1000,10000")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    model, label_encoder = load_or_train()
+    legacy_model = joblib.load(MODEL_PATH) if os.path.exists(MODEL_PATH) else model
+    records = synthetic_records(max(sizes))
+    legacy_row = timed(lambda: legacy_predict(legacy_model, label_encoder, records[0]))
+    predictor = CarPredictor(model, label_encoder)
+
+    print(f"legacy one-row DataFrame path: {1 / legacy_row:,.0f} rows/sec")
+    print(f"{'batch':>8} {'encode ms':>10} {'predict ms':>11} {'rows/sec':>12} {'speedup':>8}")
+    for size in sizes:
+        batch = records[:size]
+        encode = timed(lambda: predictor.encoder.encode(batch))
+        X = predictor.encoder.encode(batch)
+        total = timed(lambda: predictor.predict(predictor.encoder.encode(batch)))
+        rows_per_sec = size / total
+        print(f"{size:>8} {encode * 1e3:>10.3f} {(total - encode) * 1e3:>11.3f} "
+              f"{rows_per_sec:>12,.0f} {rows_per_sec * legacy_row:>7.1f}x")
+        assert len(predictor.predict(X)) == size
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Name search benchmark: the old case-insensitive regex over `name` versus
+# the indexed token-prefix filter, for typeahead-style queries at several
+# collection sizes. Needs a local mongod for meaningful numbers; --mongomock
+# only checks that both paths run.
+#
+# Run from backend/:  python -m benchmarks.bench_search [--sizes 10000,100000,1000000]
+import argparse
+import random
+import re
+import time
+
+from pymongo import MongoClient
+
+from indexes import ensure_indexes
+from search import name_filter, search_fields
+from benchmarks.synthetic import CAR_NAMES
+
+BENCH_DB = "drivewise_search_bench"
+TRIMS = ["GLi", "XLi", "Altis", "VXR", "VXL", "Oriel", "Prosmatec", "Hybrid", "Turbo", "Grande"]
+QUERIES = ["t", "to", "toy", "toyota c", "corolla", "civ", "honda civic or", "suzuki alto vx"]
+
+
+def fill(collection, target, batch_size=10000):
+    rng = random.Random(len(CAR_NAMES))
+    count = collection.estimated_document_count()
+    while count < target:
+        batch = []
+        for _ in range(min(batch_size, target - count)):
+            name = f"{rng.choice(CAR_NAMES)} {rng.choice(TRIMS)} {rng.randint(2000, 2024)}"
+            batch.append({"name": name, "price": float(rng.randint(3, 80) * 100000),
+                          "year": rng.randint(2000, 2024), **search_fields(name)})
+        collection.insert_many(batch, ordered=False)
+        count += len(batch)
+
+
+def time_queries(collection, build, limit, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text in QUERIES:
+            list(collection.find(build(text), {"name": 1}).sort("price", 1).limit(limit))
+    return (time.perf_counter() - start) / (repeats * len(QUERIES))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--limit", type=int, default=9)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(args.uri)
+    client.drop_database(BENCH_DB)
+    collection = client[BENCH_DB]["cars"]
+    ensure_indexes(client[BENCH_DB])
+
+    def regex_filter(text):
+        return {"name": {"$regex": re.escape(text), "$options": "i"}}
+
+    print(f"{'listings':>10} {'regex ms':>10} {'indexed ms':>11} {'speedup':>8}")
+    try:
+        for size in sorted(int(s) for s in args.sizes.split(",")):
+            fill(collection, size)
+            regex = time_queries(collection, regex_filter, args.limit, args.repeats)
+            indexed = time_queries(collection, name_filter, args.limit, args.repeats)
+            print(f"{size:>10,} {regex * 1e3:>10.2f} {indexed * 1e3:>11.2f} {regex / indexed:>7.1f}x")
+    finally:
+        client.drop_database(BENCH_DB)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Serialization benchmark per 1,000 listings: the old recursive parse_json()
+# over full documents followed by jsonify(), versus projected documents
+# written by serialization.json_response() in one pass. Reports time and
+# the tracemalloc allocation peak for each path.
+#
+# Run from backend/:  python -m benchmarks.bench_serialization [--listings 1000]
+import argparse
+import tracemalloc
+
+from bson import ObjectId
+from flask import Flask, jsonify
+
+from serialization import LISTING_FIELDS, json_response, orjson
+from benchmarks.bench_predict import timed
+from benchmarks.synthetic import synthetic_listings
+
+
+# The helper app.py used before serialization.py
+def legacy_parse_json(data):
+    if isinstance(data, list):
+        return [legacy_parse_json(item) for item in data]
+    if isinstance(data, dict):
+        result = {}
+        for key, value in data.items():
+            if key == "_id" and isinstance(value, ObjectId):
+                result[key] = str(value)
+            else:
+                result[key] = legacy_parse_json(value)
+        return result
+    return data
+
+
+def peak_allocation(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listings", type=int, default=1000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    full = synthetic_listings(args.listings)
+    projected = [{"_id": car["_id"], **{field: car[field] for field in LISTING_FIELDS}} for car in full]
+
+    def legacy():
+        return jsonify({"cars": legacy_parse_json(full)}).get_data()
+
+    def current():
+        return json_response({"cars": projected}).get_data()
+
+    with app.app_context():
+        legacy_size, current_size = len(legacy()), len(current())
+        print(f"encoder: {'orjson' if orjson else 'json (orjson not installed)'}, {args.listings} listings")
+        print(f"{'path':<28} {'ms':>8} {'peak KiB':>9} {'bytes':>9}")
+        for name, fn, size in (("parse_json + jsonify", legacy, legacy_size),
+                               ("projection + json_response", current, current_size)):
+            peak = peak_allocation(fn)
+            print(f"{name:<28} {timed(fn) * 1e3:>8.2f} {peak / 1024:>9.0f} {size:>9,}")
+
+
+if __name__ == "__main__":
+    main()
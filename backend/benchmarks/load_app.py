@@ -0,0 +1,124 @@
+# Throughput scaling harness for the production server: starts gunicorn
+# (gunicorn.conf.py) with 1, 2, 4, ... workers up to the CPU count, drives
+# a mixed read + /predict load over keep-alive connections and reports
+# requests/sec and latency for each worker count.
+#
+# Needs gunicorn, a trained model in models/ and a reachable MongoDB
+# (MONGO_URI); seed listings first, e.g. python -m benchmarks.bench_search
+# --sizes 100000 against the same database, or point --url at a running
+# deployment to load it with a fixed configuration instead.
+#
+# Run from backend/:  python -m benchmarks.load_app [--workers 1,2,4] [--threads 4] [--clients 32] [--seconds 10]
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_records
+
+READ_PATHS = [
+    "/api/cars?limit=9",
+    "/api/cars?limit=9&sort=year-desc",
+    "/api/cars?limit=9&category=SUVs",
+    "/api/cars?limit=9&minPrice=1000000&maxPrice=3000000",
+    "/api/categories",
+    "/api/cars/facets",
+]
+
+
+def wait_ready(host, port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/api/categories")
+            conn.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def drive(host, port, clients, seconds, predict_share):
+    bodies = [json.dumps(record) for record in synthetic_records(256)]
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        n = i
+        while time.perf_counter() < deadline:
+            n += 1
+            start = time.perf_counter()
+            if n % 100 < predict_share * 100:
+                conn.request("POST", "/predict", body=bodies[n % len(bodies)],
+                             headers={"Content-Type": "application/json"})
+            else:
+                conn.request("GET", READ_PATHS[n % len(READ_PATHS)])
+            response = conn.getresponse()
+            response.read()
+            latencies[i].append(time.perf_counter() - start)
+            if response.status >= 400:
+                errors[i] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    all_latencies = np.concatenate([np.array(l) for l in latencies if l]) * 1e3
+    return len(all_latencies) / elapsed, np.percentile(all_latencies, 50), np.percentile(all_latencies, 99), sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    cpus = multiprocessing.cpu_count()
+    default_workers = ",".join(str(1 << i) for i in range(cpus.bit_length()) if 1 << i <= cpus)
+    parser.add_argument("--url")
+    parser.add_argument("--workers", default=default_workers)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--predict-share", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'threads':>7} {'req/sec':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    if args.url:
+        parts = urlsplit(args.url)
+        rps, p50, p99, errors = drive(parts.hostname, parts.port or 80, args.clients, args.seconds, args.predict_share)
+        print(f"{'-':>7} {'-':>7} {rps:>9,.0f} {p50:>8.2f} {p99:>8.2f} {errors:>7}")
+        return
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(args.threads),
+                   PORT=str(args.port), MODEL_POLL_INTERVAL="0")
+        server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready("127.0.0.1", args.port):
+                print(f"{workers:>7} server did not start")
+                continue
+            drive("127.0.0.1", args.port, args.clients, 1, args.predict_share)  # warm up
+            rps, p50, p99, errors = drive("127.0.0.1", args.port, args.clients, args.seconds, args.predict_share)
+            print(f"{workers:>7} {args.threads:>7} {rps:>9,.0f} {p50:>8.2f} {p99:>8.2f} {errors:>7}")
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
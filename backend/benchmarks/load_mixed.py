@@ -0,0 +1,310 @@
+# Mixed-traffic load test: browsing (/api/cars with random filters, sorts
+# and pages, car details, categories, facets, typeahead), /predict, logins
+# and /api/list-car uploads in configurable proportions from N keep-alive
+# clients. Reports throughput and p50/p95/p99 latency per endpoint as JSON,
+# so runs can be diffed.
+#
+# Point --url at a running server whose database was filled with
+# benchmarks.seed (same --users; logins use its password), or pass
+# --in-process to serve the app from this process on an in-memory MongoDB
+# stand-in (mongomock) seeded with --cars listings. mongomock is slow and
+# not thread-safe, so in-process numbers (and the odd error under many
+# clients) are only comparable with each other. --async-writes sends the
+# uploads with "Prefer: respond-async", so they are acknowledged once queued
+# and written in batches by the job workers.
+#
+# Run from backend/:  python -m benchmarks.load_mixed [--url http://127.0.0.1:5000] [--clients 16] [--seconds 30] [--async-writes] [--out report.json]
+import argparse
+import http.client
+import json
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from benchmarks.seed import BENCH_PASSWORD, seed_database
+from benchmarks.synthetic import CAR_NAMES, synthetic_records
+
+DEFAULT_MIX = "cars=40,car=10,categories=5,facets=5,suggest=10,predict=20,login=5,list_car=5"
+CATEGORIES = ["Sedans", "SUVs", "Hatchbacks", "Luxury Cars", "Electric", "Budget Cars"]
+SORTS = ["price-asc", "price-desc", "year-asc", "year-desc"]
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+# An 8x8 PNG whose pixels encode n, so every upload is a new file
+def tiny_png(n):
+    pixel = bytes(((n >> 16) & 255, (n >> 8) & 255, n & 255))
+    raw = b"".join(b"\x00" + pixel * 8 for _ in range(8))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 8, 8, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, content in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: image/png\r\n\r\n'.encode() + content + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Client:
+    def __init__(self, host, port, users, car_ids, records, seed, async_writes=False):
+        self.conn = http.client.HTTPConnection(host, port, timeout=60)
+        self.write_headers = {"Prefer": "respond-async"} if async_writes else {}
+        self.rng = random.Random(seed)
+        self.users = users
+        self.car_ids = car_ids
+        self.records = records
+        self.token = None
+        self.uploads = seed << 20
+
+    def request(self, method, path, body=None, headers=None):
+        self.conn.request(method, path, body=body, headers=headers or {})
+        response = self.conn.getresponse()
+        data = response.read()
+        return response.status, data
+
+    def cars(self):
+        args = {"limit": 9, "page": self.rng.choice([1, 1, 1, 2, 3, 5]), "sort": self.rng.choice(SORTS)}
+        if self.rng.random() < 0.4:
+            args["category"] = self.rng.choice(CATEGORIES)
+        if self.rng.random() < 0.3:
+            low = self.rng.randint(3, 100) * 100000
+            args.update(minPrice=low, maxPrice=low + self.rng.randint(5, 50) * 100000)
+        if self.rng.random() < 0.1:
+            args["featured"] = "true"
+        if self.rng.random() < 0.1:
+            args["name"] = self.rng.choice(CAR_NAMES).split()[-1].lower()
+        return "GET /api/cars", self.request("GET", "/api/cars?" + urlencode(args))[0]
+
+    def car(self):
+        if not self.car_ids:
+            return self.cars()
+        return "GET /api/cars/<id>", self.request("GET", f"/api/cars/{self.rng.choice(self.car_ids)}")[0]
+
+    def categories(self):
+        return "GET /api/categories", self.request("GET", "/api/categories")[0]
+
+    def facets(self):
+        category = self.rng.choice([None] + CATEGORIES)
+        path = "/api/cars/facets" + ("?" + urlencode({"category": category}) if category else "")
+        return "GET /api/cars/facets", self.request("GET", path)[0]
+
+    def suggest(self):
+        name = self.rng.choice(CAR_NAMES).lower()
+        query = name[:self.rng.randint(1, len(name))]
+        return "GET /api/cars/suggest", self.request("GET", "/api/cars/suggest?" + urlencode({"q": query}))[0]
+
+    def predict(self):
+        body = json.dumps(self.rng.choice(self.records))
+        return "POST /predict", self.request("POST", "/predict", body, {"Content-Type": "application/json"})[0]
+
+    def login(self):
+        status, data = self.request("POST", "/api/login", json.dumps({
+            "email": f"seller{self.rng.randrange(self.users)}@example.com", "password": BENCH_PASSWORD
+        }), {"Content-Type": "application/json"})
+        if status == 200:
+            self.token = json.loads(data)["token"]
+        return "POST /api/login", status
+
+    def list_car(self):
+        if self.token is None:
+            self.login()
+        name = self.rng.choice(CAR_NAMES)
+        make, _, model = name.partition(" ")
+        self.uploads += 1
+        body, content_type = multipart({
+            "name": name, "location": "Lahore", "price": self.rng.randint(5, 100) * 100000,
+            "year": self.rng.randint(2000, 2024), "mileage": self.rng.randint(0, 200000), "fuel": "Petrol",
+            "transmission": "Manual", "category": self.rng.choice(CATEGORIES), "make": make, "model": model
+        }, [("images", "car.png", tiny_png(self.uploads))])
+        status, _ = self.request("POST", "/api/list-car", body,
+                                 {"Content-Type": content_type, "Authorization": f"Bearer {self.token}",
+                                  **self.write_headers})
+        return "POST /api/list-car", status
+
+
+OPERATIONS = {name: getattr(Client, name) for name in
+              ("cars", "car", "categories", "facets", "suggest", "predict", "login", "list_car")}
+LABELS = {
+    "cars": "GET /api/cars", "car": "GET /api/cars/<id>", "categories": "GET /api/categories",
+    "facets": "GET /api/cars/facets", "suggest": "GET /api/cars/suggest", "predict": "POST /predict",
+    "login": "POST /api/login", "list_car": "POST /api/list-car",
+}
+
+
+def drive(host, port, clients, seconds, weights, users, car_ids, seed, async_writes=False):
+    records = synthetic_records(512, seed=seed)
+    names, cumulative = list(weights), np.cumsum(list(weights.values()))
+    latencies = [defaultdict(list) for _ in range(clients)]
+    errors = [defaultdict(int) for _ in range(clients)]
+    deadline = time.perf_counter() + seconds
+
+    def run(i):
+        client = Client(host, port, users, car_ids, records, seed * 1000 + i, async_writes)
+        while time.perf_counter() < deadline:
+            operation = names[int(np.searchsorted(cumulative, client.rng.random() * cumulative[-1], side="right"))]
+            start = time.perf_counter()
+            try:
+                label, status = OPERATIONS[operation](client)
+            except (OSError, http.client.HTTPException):
+                label, status = LABELS[operation], 0
+                client.conn.close()
+            latencies[i][label].append(time.perf_counter() - start)
+            if status == 0 or status >= 400:
+                errors[i][label] += 1
+        client.conn.close()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    merged, merged_errors = defaultdict(list), defaultdict(int)
+    for per_client, per_client_errors in zip(latencies, errors):
+        for label, values in per_client.items():
+            merged[label].extend(values)
+        for label, count in per_client_errors.items():
+            merged_errors[label] += count
+    endpoints = {label: summarize(values, merged_errors[label], elapsed) for label, values in sorted(merged.items())}
+    total = summarize([v for values in merged.values() for v in values], sum(merged_errors.values()), elapsed)
+    return elapsed, endpoints, total
+
+
+def summarize(latencies, errors, elapsed):
+    ms = np.array(latencies) * 1e3
+    if not len(ms):
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": int(len(ms)),
+        "errors": int(errors),
+        "rps": round(len(ms) / elapsed, 2),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def serve_in_process(cars, users, port):
+    import mongomock
+    from werkzeug.serving import make_server
+
+    import mongo
+    client = mongomock.MongoClient()
+    # MongoConnection creates its client through this name
+    mongo.MongoClient = lambda *args, **kwargs: client
+    seed_database(client["drivewise"], cars, users, bcrypt_rounds=int(os.getenv("BCRYPT_ROUNDS", 12)))
+
+    from app import create_app
+    app = create_app()
+    # Writes sent with --async-writes are done by the job workers
+    app.extensions["drivewise"].job_queue.start()
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sample_car_ids(host, port, n=200):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        conn.request("GET", "/api/cars?limit=100&sort=year-desc")
+        cars = json.loads(conn.getresponse().read()).get("cars", [])
+        return [car["_id"] for car in cars][:n]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--in-process", action="store_true")
+    parser.add_argument("--cars", type=int, default=10000, help="listings to seed for --in-process")
+    parser.add_argument("--users", type=int, default=1000, help="seeded sellers to log in as")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--async-writes", action="store_true", help="queue uploads with Prefer: respond-async")
+    parser.add_argument("--port", type=int, default=5056, help="listen port for --in-process")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    server = None
+    if args.in_process:
+        server = serve_in_process(args.cars, args.users, args.port)
+        host, port = "127.0.0.1", args.port
+    else:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+
+    try:
+        car_ids = sample_car_ids(host, port)
+        if args.warmup:
+            drive(host, port, args.clients, args.warmup, weights, args.users, car_ids, args.seed + 1,
+                  args.async_writes)
+        elapsed, endpoints, total = drive(host, port, args.clients, args.seconds, weights, args.users,
+                                          car_ids, args.seed, args.async_writes)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "target": "in-process (mongomock)" if args.in_process else args.url,
+            "cars": args.cars if args.in_process else None,
+            "clients": args.clients,
+            "seconds": round(elapsed, 2),
+            "mix": weights,
+            "seed": args.seed,
+            "async_writes": args.async_writes,
+        },
+        "total": total,
+        "endpoints": endpoints,
+    }
+    print(f"{'endpoint':<24} {'requests':>9} {'errors':>7} {'req/sec':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+          file=sys.stderr)
+    for label, stats in list(endpoints.items()) + [("total", total)]:
+        if stats["requests"]:
+            print(f"{label:<24} {stats['requests']:>9,} {stats['errors']:>7} {stats['rps']:>9,.1f} "
+                  f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}", file=sys.stderr)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Load test for hot image serving: requests/sec for repeatedly fetched
+# uploads, over keep-alive connections from several client threads.
+#
+# Without --url it starts a local threaded server on a temporary uploads
+# directory and compares the old exists() + send_from_directory() handler
+# with static_files.StaticFiles, both for full downloads and for browser
+# revalidations (If-None-Match -> 304). With --url it loads a running
+# server instead, e.g. --url http://localhost:5000/uploads/<file>.
+#
+# Run from backend/:  python -m benchmarks.load_static [--threads 8] [--seconds 5]
+import argparse
+import http.client
+import logging
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from flask import Flask, jsonify, send_from_directory
+from werkzeug.serving import make_server
+
+from static_files import StaticFiles
+
+
+def build_server(root):
+    app = Flask(__name__)
+    files = StaticFiles(root, immutable=lambda path: True)
+
+    @app.route("/legacy/<filename>")
+    def legacy(filename):
+        if not os.path.exists(os.path.join(root, filename)):
+            return jsonify({"error": "Image not found"}), 404
+        return send_from_directory(root, filename)
+
+    @app.route("/uploads/<filename>")
+    def uploads(filename):
+        return files.serve(filename) or (jsonify({"error": "Image not found"}), 404)
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(url, threads, seconds, revalidate):
+    parts = urlsplit(url)
+    counts, errors = [0] * threads, [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+        headers = {}
+        if revalidate:
+            conn.request("GET", parts.path)
+            response = conn.getresponse()
+            response.read()
+            headers["If-None-Match"] = response.getheader("ETag") or ""
+        while time.perf_counter() < deadline:
+            conn.request("GET", parts.path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status in (200, 304):
+                counts[i] += 1
+            else:
+                errors[i] += 1
+        conn.close()
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return sum(counts) / elapsed, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--size-kb", type=int, default=40)
+    args = parser.parse_args()
+
+    print(f"{'target':<40} {'mode':<11} {'req/sec':>9} {'errors':>7}")
+    if args.url:
+        for revalidate in (False, True):
+            rps, errors = run(args.url, args.threads, args.seconds, revalidate)
+            print(f"{args.url:<40} {'304' if revalidate else 'full':<11} {rps:>9,.0f} {errors:>7}")
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        filename = "0" * 64 + ".jpg"
+        with open(os.path.join(root, filename), "wb") as f:
+            f.write(os.urandom(args.size_kb * 1024))
+        server = build_server(root)
+        base = f"http://127.0.0.1:{server.server_port}"
+        try:
+            for name in ("legacy", "uploads"):
+                for revalidate in (False, True):
+                    rps, errors = run(f"{base}/{name}/{filename}", args.threads, args.seconds, revalidate)
+                    label = "send_from_directory" if name == "legacy" else "StaticFiles"
+                    print(f"{label:<40} {'304' if revalidate else 'full':<11} {rps:>9,.0f} {errors:>7}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Seeds a database with synthetic listings and their sellers for load
+# tests, and optionally writes a synthetic training set with the
+# FYP_dataset.csv schema so a model can be trained offline
+# (python train_model.py --data <path>).
+#
+# Every seller logs in with BENCH_PASSWORD. Listings are inserted in
+# batches, so seeding 1M cars needs no more memory than seeding 10k; the
+# category stats are rebuilt at the end. benchmarks.load_mixed
+# --in-process seeds its in-memory stand-in with seed_database() too.
+#
+# Run from backend/:  python -m benchmarks.seed --cars 100000 [--users 1000] [--drop] [--dataset data/synthetic.csv]
+import argparse
+import time
+
+import bcrypt
+from pymongo import MongoClient
+
+from car_stats import reconcile
+from indexes import ensure_indexes
+from benchmarks.synthetic import synthetic_dataset, synthetic_listing_batches, synthetic_users
+
+BENCH_PASSWORD = "benchmark-password"
+
+
+def seed_database(db, cars, users=1000, seed=0, bcrypt_rounds=12, drop=False, batch_size=10000):
+    if drop:
+        for name in ("cars", "users", "car_stats"):
+            db[name].drop()
+    ensure_indexes(db)
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt(bcrypt_rounds))
+    existing = {user["email"] for user in db["users"].find({}, {"email": 1})}
+    new_users = [user for user in synthetic_users(users, password_hash) if user["email"] not in existing]
+    if new_users:
+        db["users"].insert_many(new_users, ordered=False)
+    for batch in synthetic_listing_batches(cars, seed=seed, sellers=users, batch_size=batch_size):
+        db["cars"].insert_many(batch, ordered=False)
+    reconcile(db["cars"], db["car_stats"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="drivewise")
+    parser.add_argument("--cars", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="match the server's BCRYPT_ROUNDS")
+    parser.add_argument("--drop", action="store_true", help="drop cars, users and car_stats first")
+    parser.add_argument("--dataset", help="also write a synthetic training CSV here")
+    parser.add_argument("--rows", type=int, default=50000, help="rows for --dataset")
+    args = parser.parse_args()
+
+    if args.dataset:
+        synthetic_dataset(args.rows, seed=args.seed).to_csv(args.dataset, index=False)
+        print(f"Wrote {args.rows:,} training rows to {args.dataset}")
+    if not args.cars and not args.users:
+        return
+
+    client = MongoClient(args.uri)
+    start = time.perf_counter()
+    seed_database(client[args.db], args.cars, args.users, args.seed, args.bcrypt_rounds, args.drop)
+    print(f"Seeded {args.cars:,} cars and {args.users:,} users into {args.db} "
+          f"in {time.perf_counter() - start:.1f}s (password: {BENCH_PASSWORD})")
+
+
+if __name__ == "__main__":
+    main()
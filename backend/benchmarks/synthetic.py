@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from inference import CATEGORICAL_MAPPINGS, FEATURE_COLUMNS
+
+CAR_NAMES = [
+    "Daihatsu Cuore", "Honda City", "Honda Civic", "Honda Vezel", "Mercedes Benz",
+    "Suzuki Alto", "Suzuki Baleno", "Suzuki Bolan", "Suzuki Cultus", "Suzuki Khyber",
+    "Suzuki Liana", "Suzuki Mehran", "Suzuki Swift", "Suzuki Wagon", "Toyota Aqua",
+    "Toyota Corolla", "Toyota Fortuner", "Toyota Land", "Toyota Passo", "Toyota Prado",
+    "Toyota Prius", "Toyota Vitz"
+]
+ENGINE_CAPACITIES = [660, 800, 1000, 1300, 1500, 1800, 2000, 2700, 3000]
+
+
+# Random prediction records drawn from the same value space as the form
+def synthetic_records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {
+        "Price": rng.integers(5, 400, n) * 100000.0,
+        "Model Year": rng.integers(1995, 2025, n).astype(float),
+        "Engine Capacity": rng.choice(ENGINE_CAPACITIES, n).astype(float),
+    }
+    for col, values in CATEGORICAL_MAPPINGS.items():
+        columns[col] = rng.choice(values, n)
+    return [
+        {col: columns[col][i].item() for col in FEATURE_COLUMNS}
+        for i in range(n)
+    ]
+
+
+# Labelled dataset with the FYP_dataset.csv schema for offline training
+def synthetic_dataset(n, seed=0):
+    df = pd.DataFrame(synthetic_records(n, seed), columns=FEATURE_COLUMNS)
+    rng = np.random.default_rng(seed + 1)
+    # Tie the label loosely to price and body type so the forest has signal
+    price_rank = (df["Price"].rank(pct=True) * (len(CAR_NAMES) - 1)).astype(int)
+    body_shift = df["Body Type"].map({v: i for i, v in enumerate(CATEGORICAL_MAPPINGS["Body Type"])})
+    noise = rng.integers(-1, 2, n)
+    labels = (price_rank + body_shift + noise).clip(0, len(CAR_NAMES) - 1)
+    df.insert(0, "Car Name", [CAR_NAMES[i] for i in labels])
+    return df
+
+
+# Car listing documents as stored in the cars collection, sold by the
+# sellers seller0@example.com .. seller{sellers - 1}@example.com
+def synthetic_listings(n, seed=0, sellers=1000):
+    from bson import ObjectId
+    from image_store import variant_filename
+    from search import search_fields
+
+    rng = np.random.default_rng(seed)
+    categories = ["Sedans", "SUVs", "Hatchbacks", "Luxury Cars", "Electric", "Budget Cars"]
+    locations = ["Karachi", "Lahore", "Islamabad", "Rawalpindi", "Peshawar", "Multan", "Faisalabad"]
+    listings = []
+    for i in range(n):
+        name = str(rng.choice(CAR_NAMES))
+        make, _, model = name.partition(" ")
+        listing = {
+            "_id": ObjectId(),
+            "name": name,
+            "location": str(rng.choice(locations)),
+            "price": float(rng.integers(3, 400) * 100000),
+            "year": int(rng.integers(1995, 2025)),
+            "mileage": int(rng.integers(0, 300000)),
+            "fuel": str(rng.choice(CATEGORICAL_MAPPINGS["Engine Type"])),
+            "transmission": str(rng.choice(CATEGORICAL_MAPPINGS["Transmission Type"])),
+            "postedDays": int(rng.integers(0, 60)),
+            "images": [f"/uploads/{ObjectId()}.jpg" for _ in range(int(rng.integers(1, 6)))],
+            "featured": bool(rng.random() < 0.1),
+            "make": make,
+            "model": model,
+            "category": str(rng.choice(categories)),
+            "seller_email": f"seller{int(rng.integers(0, sellers))}@example.com",
+            **search_fields(name, make, model)
+        }
+        listing["thumbnails"] = [variant_filename(url, "thumb") for url in listing["images"]]
+        listings.append(listing)
+    return listings
+
+
+# Listings in batches of batch_size, so 1M cars never sit in memory at once
+def synthetic_listing_batches(n, seed=0, sellers=1000, batch_size=10000):
+    for i, start in enumerate(range(0, n, batch_size)):
+        yield synthetic_listings(min(batch_size, n - start), seed=seed + i, sellers=sellers)
+
+
+# The sellers of synthetic_listings(); every account shares one password
+# hash, since hashing it per user would dominate seeding
+def synthetic_users(n, password_hash):
+    return [{
+        "fullName": f"Seller {i}",
+        "email": f"seller{i}@example.com",
+        "password": password_hash,
+        "contactNumber": f"0300{i:07d}",
+        "profilePicture": ""
+    } for i in range(n)]
@@ -0,0 +1,145 @@
+import base64
+import json
+
+from bson import ObjectId
+
+from search import model_key, name_filter
+
+# Sort options for /api/cars: (field, order); ties are broken on _id
+SORT_OPTIONS = {
+    "price-asc": ("price", 1),
+    "price-desc": ("price", -1),
+    "year-asc": ("year", 1),
+    "year-desc": ("year", -1)
+}
+
+
+# Deleted listings stay in the collection as tombstones until the reaper
+# removes them (see reaper.py); every listing read goes through live()
+NOT_DELETED = {"deleted": {"$ne": True}}
+
+
+def live(query=None):
+    return dict(query or {}, **NOT_DELETED)
+
+
+# Mongo filter for the /api/cars query string (featured, name, category,
+# minPrice, maxPrice); shared with the index/query-plan checks
+def build_car_filter(args):
+    query = {}
+    if args.get("featured") == "true":
+        query["featured"] = True
+    if args.get("name"):
+        query.update(name_filter(args.get("name")))
+    if args.get("category"):
+        query["category"] = args.get("category")
+    if args.get("minPrice"):
+        query["price"] = query.get("price", {})
+        query["price"]["$gte"] = float(args.get("minPrice"))
+    if args.get("maxPrice"):
+        query["price"] = query.get("price", {})
+        query["price"]["$lte"] = float(args.get("maxPrice"))
+    return query
+
+
+def parse_sort(sort_param):
+    if sort_param not in SORT_OPTIONS:
+        sort_param = "price-asc"
+    return (sort_param,) + SORT_OPTIONS[sort_param]
+
+
+def encode_cursor(sort_param, sort_field, car, direction):
+    payload = {"s": sort_param, "v": car.get(sort_field), "id": str(car["_id"]), "d": direction}
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return token.decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort_param):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        cursor = {"v": payload["v"], "id": ObjectId(payload["id"]), "d": payload["d"]}
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort_param or cursor["d"] not in ("next", "prev"):
+        raise ValueError("Cursor does not match the requested sort")
+    return cursor
+
+
+def keyset_filter(sort_field, sort_order, value, car_id, direction):
+    forward = (sort_order == 1) == (direction == "next")
+    op = "$gt" if forward else "$lt"
+    return {"$or": [{sort_field: {op: value}}, {sort_field: value, "_id": {op: car_id}}]}
+
+
+# Everything get_cars() needs to fetch one page: the caller's filter, the
+# live (possibly keyset-narrowed) page filter, sort, skip and limit. Shared
+# by the Flask and async listing endpoints. An empty "query" means the total
+# is the live count kept in car_stats. Raises ValueError for bad arguments.
+def plan_car_page(args, max_page_size):
+    page = int(args.get("page", 1))
+    limit = int(args.get("limit", 9))
+    if page < 1 or limit < 1 or limit > max_page_size:
+        raise ValueError(f"page must be >= 1 and limit between 1 and {max_page_size}")
+    query = build_car_filter(args)
+    sort_param, sort_field, sort_order = parse_sort(args.get("sort", "price-asc"))
+
+    # Keyset pagination: a cursor pins (sort value, _id) of the last car
+    # seen, so any page costs the same index seek as the first one
+    cursor = decode_cursor(args["cursor"], sort_param) if args.get("cursor") else None
+    direction = cursor["d"] if cursor else "next"
+    keyset = None
+    if cursor:
+        keyset = keyset_filter(sort_field, sort_order, cursor["v"], cursor["id"], direction)
+    fetch_order = sort_order if direction == "next" else -sort_order
+    return {
+        "page": page,
+        "limit": limit,
+        "skip": 0 if cursor else (page - 1) * limit,
+        "query": query,
+        "keyset": keyset,
+        "find_query": live({"$and": [query, keyset]} if query else keyset) if keyset else live(query),
+        "sort": [(sort_field, fetch_order), ("_id", fetch_order)],
+        "sort_param": sort_param,
+        "sort_field": sort_field,
+        "cursor": cursor,
+        "direction": direction,
+    }
+
+
+# Response body for a page fetched with limit + 1 rows per plan_car_page()
+def car_page_payload(plan, cars, total_cars):
+    limit, direction, cursor = plan["limit"], plan["direction"], plan["cursor"]
+    has_more = len(cars) > limit
+    cars = cars[:limit]
+    if direction == "prev":
+        cars.reverse()
+
+    next_cursor = prev_cursor = None
+    if cars:
+        if has_more or direction == "prev":
+            next_cursor = encode_cursor(plan["sort_param"], plan["sort_field"], cars[-1], "next")
+        if (has_more if direction == "prev" else (cursor is not None or plan["page"] > 1)):
+            prev_cursor = encode_cursor(plan["sort_param"], plan["sort_field"], cars[0], "prev")
+
+    return {
+        "cars": cars,
+        "totalCars": total_cars,
+        "totalPages": (total_cars + limit - 1) // limit,
+        "currentPage": None if cursor else plan["page"],
+        "nextCursor": next_cursor,
+        "prevCursor": prev_cursor
+    }
+
+
+# Up to limit live listings of one predicted model that match query,
+# closest in price to budget first: one index range scan on each side of
+# the budget, so the cost is bounded by limit whatever the inventory size.
+def nearest_listings(collection, query, car_name, budget, limit, projection=None):
+    base = live(dict(query, model_key=model_key(car_name)))
+    below = collection.find({"$and": [base, {"price": {"$lt": budget}}]}, projection) \
+        .sort([("price", -1), ("_id", -1)]).limit(limit)
+    above = collection.find({"$and": [base, {"price": {"$gte": budget}}]}, projection) \
+        .sort([("price", 1), ("_id", 1)]).limit(limit)
+    cars = list(below) + list(above)
+    cars.sort(key=lambda car: abs(car.get("price", budget) - budget))
+    return cars[:limit]
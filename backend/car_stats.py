@@ -0,0 +1,161 @@
+# Materialized listing stats, one document per category:
+#
+#   {"_id": "SUVs", "count": 42, "price_buckets": {"0": 3, "4": 17, ...}}
+#
+# price_buckets maps an index into PRICE_BUCKETS to the number of listings
+# priced inside that bucket. Every car write applies its delta with a single
+# $inc, so /api/categories, the AllCars facets and the unfiltered listing
+# total read O(categories) documents regardless of how many cars exist.
+# Tombstoned listings leave the stats when they are deleted. The inc is not
+# transactional with the car write itself; reconcile() rebuilds the
+# documents from the live cars and reports any drift.
+#
+#   python car_stats.py [--uri mongodb://localhost:27017] [--dry-run]
+import argparse
+import bisect
+import logging
+import os
+from collections import Counter, defaultdict
+
+from pymongo import MongoClient
+
+from car_queries import NOT_DELETED
+
+logger = logging.getLogger(__name__)
+
+PRICE_BUCKETS = [0, 500000, 1000000, 1500000, 2000000, 3000000, 5000000,
+                 7500000, 10000000, 15000000, 20000000, 30000000, 50000000]
+
+
+def price_bucket(price):
+    try:
+        return max(bisect.bisect_right(PRICE_BUCKETS, float(price)) - 1, 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def car_deltas(car, sign):
+    inc = Counter({"count": sign})
+    bucket = price_bucket(car.get("price"))
+    if bucket is not None:
+        inc[f"price_buckets.{bucket}"] += sign
+    return {car.get("category"): inc}
+
+
+def _apply(stats_collection, deltas):
+    for category, inc in deltas.items():
+        inc = {field: n for field, n in inc.items() if n}
+        if inc:
+            stats_collection.update_one({"_id": category}, {"$inc": inc}, upsert=True)
+
+
+def _record_many(stats_collection, cars, sign):
+    deltas = defaultdict(Counter)
+    for car in cars:
+        for category, inc in car_deltas(car, sign).items():
+            deltas[category].update(inc)
+    _apply(stats_collection, deltas)
+
+
+# One $inc per category for a whole batch of new listings
+def record_added_many(stats_collection, cars):
+    _record_many(stats_collection, cars, 1)
+
+
+def record_removed(stats_collection, cars):
+    _record_many(stats_collection, cars, -1)
+
+
+# An update moves the listing out of its old category/bucket and into the
+# new one; edits that touch neither are free. One $inc per category for a
+# batch of (old, new) listing pairs.
+def record_updated_many(stats_collection, changes):
+    deltas = defaultdict(Counter)
+    for old_car, new_car in changes:
+        for car, sign in ((old_car, -1), (new_car, 1)):
+            for category, inc in car_deltas(car, sign).items():
+                deltas[category].update(inc)
+    _apply(stats_collection, deltas)
+
+
+def category_counts(stats_collection):
+    return [{"name": doc["_id"], "count": doc["count"]}
+            for doc in stats_collection.find({"count": {"$gt": 0}}, {"count": 1})]
+
+
+# Live listings across all categories, i.e. the unfiltered /api/cars total
+def listing_count(stats_collection):
+    return sum(doc["count"] for doc in stats_collection.find({"count": {"$gt": 0}}, {"count": 1}))
+
+
+def price_histogram(stats_collection, category=None):
+    query = {"_id": category} if category else {}
+    totals = Counter()
+    for doc in stats_collection.find(query, {"price_buckets": 1}):
+        totals.update({int(k): n for k, n in doc.get("price_buckets", {}).items()})
+    return [{
+        "min": PRICE_BUCKETS[i],
+        "max": PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None,
+        "count": totals[i]
+    } for i in sorted(totals) if totals[i] > 0]
+
+
+def compute_stats(cars_collection):
+    stats = {}
+    for car in cars_collection.find(NOT_DELETED, {"category": 1, "price": 1}):
+        for category, inc in car_deltas(car, 1).items():
+            doc = stats.setdefault(category, {"_id": category, "count": 0, "price_buckets": {}})
+            doc["count"] += inc.pop("count")
+            for field, n in inc.items():
+                key = field.split(".", 1)[1]
+                doc["price_buckets"][key] = doc["price_buckets"].get(key, 0) + n
+    return stats
+
+
+def _normalized(doc):
+    return (doc.get("count", 0), {k: n for k, n in doc.get("price_buckets", {}).items() if n})
+
+
+# Rebuilds the stats from the cars collection. Returns the categories whose
+# stored stats differed, as {category: {"stored": ..., "actual": ...}}.
+def reconcile(cars_collection, stats_collection, dry_run=False):
+    actual = compute_stats(cars_collection)
+    stored = {doc["_id"]: doc for doc in stats_collection.find()}
+    drift = {}
+    for category in set(actual) | set(stored):
+        want = _normalized(actual.get(category, {}))
+        have = _normalized(stored.get(category, {}))
+        if want != have:
+            drift[category] = {
+                "stored": {"count": have[0], "price_buckets": have[1]},
+                "actual": {"count": want[0], "price_buckets": want[1]}
+            }
+    if not dry_run:
+        for category in drift:
+            if category in actual:
+                stats_collection.replace_one({"_id": category}, actual[category], upsert=True)
+            else:
+                stats_collection.delete_one({"_id": category})
+    if drift:
+        logger.warning(f"Listing stats drifted for {len(drift)} categories: {sorted(map(str, drift))}")
+    return drift
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="drivewise")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = MongoClient(args.uri)[args.db]
+    drift = reconcile(db["cars"], db["car_stats"], dry_run=args.dry_run)
+    for category, detail in drift.items():
+        print(f"{category}: stored {detail['stored']} actual {detail['actual']}")
+    print(f"\n{len(drift)} categor{'y' if len(drift) == 1 else 'ies'} drifted"
+          f"{' (not repaired, --dry-run)' if args.dry_run and drift else ''}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
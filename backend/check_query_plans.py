@@ -0,0 +1,151 @@
+# Verifies that every query shape the API issues is served from an index.
+#
+# Against a local mongod each shape is explain()ed and must contain an IXSCAN
+# and no COLLSCAN. mongomock has no query planner, so with --mongomock the
+# shapes are checked statically against the index key patterns instead
+# (equality fields first, then the sort field, or an anchored-prefix field
+# such as the name search tokens).
+#
+#   python check_query_plans.py [--uri mongodb://localhost:27017] [--mongomock]
+import argparse
+import itertools
+import random
+import sys
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from car_queries import SORT_OPTIONS, build_car_filter, keyset_filter, live
+from indexes import ensure_indexes
+from search import search_fields
+
+CHECK_DB = "drivewise_plan_check"
+
+
+def car_query_shapes():
+    filters = {
+        "name": [None, "toyota cor"],
+        "featured": [None, "true"],
+        "category": [None, "SUVs"],
+        "minPrice": [None, "500000"],
+        "maxPrice": [None, "3000000"],
+    }
+    for values in itertools.product(*filters.values()):
+        args = {key: value for key, value in zip(filters, values) if value is not None}
+        for sort_param, (sort_field, sort_order) in SORT_OPTIONS.items():
+            query = build_car_filter(args)
+            sort = [(sort_field, sort_order), ("_id", sort_order)]
+            yield f"cars {args} sort={sort_param}", "cars", live(query), sort
+            keyset = keyset_filter(sort_field, sort_order, 1000000, ObjectId(), "next")
+            yield f"cars {args} sort={sort_param} cursor", "cars", live({"$and": [query, keyset]} if query else keyset), sort
+
+
+def other_query_shapes():
+    yield "users by email", "users", {"email": "seller0@example.com"}, None
+    yield "cars by seller", "cars", live({"seller_email": "seller0@example.com"}), None
+    band = live({"model_key": "toyota corolla", "price": {"$gte": 800000, "$lte": 1200000}})
+    yield "recommendations below budget", "cars", {"$and": [band, {"price": {"$lt": 1000000}}]}, \
+        [("price", -1), ("_id", -1)]
+    yield "recommendations from budget", "cars", {"$and": [band, {"price": {"$gte": 1000000}}]}, \
+        [("price", 1), ("_id", 1)]
+
+
+def seed(db, n=500):
+    rng = random.Random(0)
+    db["users"].insert_many([{"email": f"seller{i}@example.com", "fullName": f"Seller {i}"} for i in range(20)])
+    names = ["Toyota Corolla", "Honda Civic", "Suzuki Alto", "Toyota Prado", "Honda City"]
+    db["cars"].insert_many([{
+        "name": f"{names[i % len(names)]} {i}",
+        **search_fields(f"{names[i % len(names)]} {i}"),
+        "price": float(rng.randint(3, 80) * 100000),
+        "year": rng.randint(2000, 2024),
+        "category": rng.choice(["Sedans", "SUVs", "Hatchbacks", "Luxury Cars", "Electric", "Budget Cars"]),
+        "featured": rng.random() < 0.1,
+        "seller_email": f"seller{rng.randrange(20)}@example.com",
+    } for i in range(n)])
+
+
+def plan_stages(node):
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node["stage"]
+        for value in node.values():
+            yield from plan_stages(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from plan_stages(value)
+
+
+def check_with_explain(collection, query, sort):
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    stages = set(plan_stages(cursor.limit(10).explain()["queryPlanner"]["winningPlan"]))
+    ok = ("IXSCAN" in stages or "IDHACK" in stages) and "COLLSCAN" not in stages
+    return ok, ",".join(sorted(stages))
+
+
+def equality_fields(query):
+    fields = set()
+    for key, value in query.items():
+        if key == "$and":
+            for part in value:
+                fields |= equality_fields(part)
+        elif not key.startswith("$") and not isinstance(value, dict):
+            fields.add(key)
+    return fields
+
+
+def prefix_fields(query):
+    fields = set()
+    for key, value in query.items():
+        if key == "$and":
+            for part in value:
+                fields |= prefix_fields(part)
+        elif isinstance(value, dict) and str(value.get("$regex", "")).startswith("^"):
+            fields.add(key)
+    return fields
+
+
+def check_statically(collection, query, sort):
+    eq = equality_fields(query)
+    prefixes = prefix_fields(query)
+    sort_fields = [field for field, _ in sort] if sort else []
+    for index in collection.index_information().values():
+        keys = [field for field, _ in index["key"]]
+        if keys[0] in prefixes:
+            return True, "+".join(keys)
+        if set(keys[:len(eq)]) == eq and keys[len(eq):len(eq) + len(sort_fields)] == sort_fields:
+            return True, "+".join(keys)
+    return False, "no matching index"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--mongomock", action="store_true")
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        client, check = mongomock.MongoClient(), check_statically
+    else:
+        client, check = MongoClient(args.uri, serverSelectionTimeoutMS=3000), check_with_explain
+    client.drop_database(CHECK_DB)
+    db = client[CHECK_DB]
+    try:
+        ensure_indexes(db)
+        seed(db)
+        failures = 0
+        for name, collection, query, sort in itertools.chain(car_query_shapes(), other_query_shapes()):
+            ok, detail = check(db[collection], query, sort)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+        print(f"\n{failures} query shape(s) without an index")
+    finally:
+        client.drop_database(CHECK_DB)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from inference import FeatureEncoder
+
+# Written by train_model.py next to the model and loaded by the server, so
+# both sides encode categories with the exact codes the forest was fit on.
+SCHEMA_VERSION = 1
+
+
+class FeatureSchemaError(ValueError):
+    pass
+
+
+def build_feature_schema(X, categorical_columns, target=None, target_classes=None):
+    vocabularies = {
+        col: sorted(str(value) for value in X[col].dropna().unique())
+        for col in categorical_columns
+    }
+    dtypes = {
+        col: "category" if col in vocabularies else str(X[col].dtype)
+        for col in X.columns
+    }
+    body = {"columns": list(X.columns), "dtypes": dtypes, "vocabularies": vocabularies}
+    schema = {
+        "schema_version": SCHEMA_VERSION,
+        "fingerprint": hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()[:12],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **body,
+    }
+    if target is not None:
+        schema["target"] = {"column": target, "classes": [str(c) for c in target_classes]}
+    return schema
+
+
+def save_feature_schema(schema, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_feature_schema(path):
+    with open(path) as f:
+        schema = json.load(f)
+    if schema.get("schema_version") != SCHEMA_VERSION:
+        raise FeatureSchemaError(f"Unsupported feature schema version {schema.get('schema_version')} in {path}")
+    return schema
+
+
+def encoder_from_schema(schema):
+    vocabularies = schema["vocabularies"]
+    numeric_columns = [col for col in schema["columns"] if col not in vocabularies]
+    return FeatureEncoder(columns=schema["columns"], numeric_columns=numeric_columns,
+                          categorical_mappings=vocabularies)
+
+
+# Vectorized training-side encoding: one categorical lookup per column
+def encode_frame(X, schema):
+    encoded = pd.DataFrame(index=X.index)
+    for col in schema["columns"]:
+        if col in schema["vocabularies"]:
+            codes = pd.Categorical(X[col].astype(str), categories=schema["vocabularies"][col]).codes
+            if (codes < 0).any():
+                unknown = sorted(set(X[col][codes < 0].astype(str)))
+                raise FeatureSchemaError(f"Unknown values for {col}: {unknown}")
+            encoded[col] = codes.astype(np.int64)
+        else:
+            encoded[col] = pd.to_numeric(X[col]).astype(np.float64)
+    return encoded
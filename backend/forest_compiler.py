@@ -0,0 +1,170 @@
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+# Flat, memory-mappable layout for a fitted RandomForestClassifier:
+#
+#   magic | header length | JSON header | padding | 64-byte aligned sections
+#
+# Sections are contiguous arrays over all trees: split feature, threshold,
+# (left, right) children and a leaf row into the leaf probability table.
+# Leaves point both children at themselves so traversal can run a fixed
+# number of steps without branching.
+MAGIC = b"DWFOREST"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def flatten_forest(model):
+    features, thresholds, children, leaf_rows, leaf_values, roots = [], [], [], [], [], []
+    offset = n_leaves = max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        node_ids = np.arange(n, dtype=np.int32) + offset
+        is_leaf = tree.children_left < 0
+        left = np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32)
+        right = np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32)
+
+        values = tree.value[is_leaf, 0, :]
+        totals = values.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1
+        rows = np.full(n, -1, dtype=np.int32)
+        rows[is_leaf] = np.arange(n_leaves, n_leaves + values.shape[0], dtype=np.int32)
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        children.append(np.stack([left, right], axis=1))
+        leaf_rows.append(rows)
+        leaf_values.append((values / totals).astype(np.float32))
+        roots.append(offset)
+        offset += n
+        n_leaves += values.shape[0]
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children": np.concatenate(children),
+        "leaf_row": np.concatenate(leaf_rows),
+        "leaf_value": np.concatenate(leaf_values),
+        "roots": np.array(roots, dtype=np.int32),
+        "classes": np.asarray(model.classes_).astype(np.int64),
+    }
+    feature_names = getattr(model, "feature_names_in_", None)
+    meta = {
+        "max_depth": int(max_depth),
+        "n_features": int(model.n_features_in_),
+        "feature_names": [str(name) for name in feature_names] if feature_names is not None else None,
+    }
+    return arrays, meta
+
+
+def export_forest(model, path):
+    arrays, meta = flatten_forest(model)
+    sections, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        sections[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({"version": FORMAT_VERSION, "meta": meta, "sections": sections}).encode("utf-8")
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    # Written next to the target and renamed so readers never see a partial
+    # file; workers still mapping the old file keep their pages.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + sections[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+class CompiledForest:
+    # Pure-NumPy predictor over an exported forest. All arrays are read-only
+    # memory maps, so forked or separate workers share the same pages.
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a compiled forest file")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest version {header['version']}")
+        data_start = _align(len(MAGIC) + 4 + header_len)
+        arrays = {}
+        for name, section in header["sections"].items():
+            shape = tuple(section["shape"])
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=section["dtype"])
+                continue
+            # Plain ndarray views over the map skip memmap subclass overhead
+            arrays[name] = np.memmap(path, dtype=section["dtype"], mode="r",
+                                     offset=data_start + section["offset"], shape=shape).view(np.ndarray)
+        meta = header["meta"]
+        self.path = path
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.leaf_row = arrays["leaf_row"]
+        self.leaf_value = arrays["leaf_value"]
+        self.roots = np.asarray(arrays["roots"])
+        self.classes_ = np.asarray(arrays["classes"])
+        self.max_depth = meta["max_depth"]
+        self.n_features_in_ = meta["n_features"]
+        if meta["feature_names"] is not None:
+            self.feature_names_in_ = np.array(meta["feature_names"], dtype=object)
+
+    def apply(self, X):
+        # sklearn compares float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat_X = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, None]
+        flat_children = self.children.ravel()
+        node = np.broadcast_to(self.roots, (X.shape[0], self.roots.size)).copy()
+        for depth in range(self.max_depth):
+            go_right = flat_X.take(row_offsets + self.feature.take(node)) > self.threshold.take(node)
+            next_node = flat_children.take(2 * node + go_right)
+            # Most paths end well before max_depth; stop once all are leaves
+            if depth % 4 == 3 and np.array_equal(next_node, node):
+                break
+            node = next_node
+        return node
+
+    def predict_proba(self, X):
+        leaves = self.leaf_row[self.apply(X)]
+        proba = np.zeros((leaves.shape[0], self.classes_.size), dtype=np.float64)
+        for t in range(leaves.shape[1]):
+            proba += self.leaf_value[leaves[:, t]]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def load_compiled_forest(path):
+    return CompiledForest(path)
+
+
+# Export an existing pickled model: python forest_compiler.py [model.pkl] [out]
+if __name__ == "__main__":
+    import joblib
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), "models", "random_forest_model.pkl")
+    out_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(model_path)[0] + ".forest"
+    export_forest(joblib.load(model_path), out_path)
+    print(f"Compiled forest saved to {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB)")
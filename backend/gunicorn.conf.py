@@ -0,0 +1,69 @@
+# Production serving (pip install gunicorn), run from backend/:
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app is imported once in the master (preload_app) so the model files
+# are loaded before fork and shared copy-on-write; each worker then opens
+# its own MongoDB pool and starts its model watcher, reaper and job
+# workers in post_fork (a lock file leaves the reaping to one worker per
+# host; every worker's job threads share the host's queue file). On
+# SIGTERM workers finish in-flight requests for up to graceful_timeout
+# seconds, then drain the inference batchers and thread/process pools.
+# Each worker holds its own model registry; a rollback through the admin
+# endpoint is pinned in models/rollback.json and followed by every worker's
+# model watcher (MODEL_POLL_INTERVAL > 0), a reload lifts it again.
+#
+#   WEB_CONCURRENCY   worker processes (default: one per CPU)
+#   GUNICORN_THREADS  threads per worker (default 4); keep MONGO_MAX_POOL_SIZE >= this
+#   PORT              listen port (default 5000)
+#   PASSWORD_WORKERS  bcrypt processes per worker (default: the CPUs split
+#                     across the workers, so one host runs about one per core)
+#   METRICS_DIR       shared directory for per-worker /metrics snapshots;
+#                     the master folds each exited worker's into totals.json
+#   RESPONSE_CACHE_BACKEND  "sqlite" here (one file per host), so a write
+#                     invalidates cached pages in every worker; "local"
+#                     would leave other workers serving stale pages
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+# Each worker has its own bcrypt pool (and 429 limit, four pending hashes
+# per process); left at one process per CPU in every worker, a login storm
+# would run cpu * workers hashes at once and starve the listing endpoints.
+# Set before the app is imported, which reads it.
+os.environ.setdefault("PASSWORD_WORKERS", str(max(1, multiprocessing.cpu_count() // workers)))
+# Per-process response caches would only be invalidated in the worker that
+# did the write
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "sqlite")
+worker_class = "gthread"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 20))
+keepalive = 5
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")
+
+
+def _services(server):
+    return server.app.wsgi().extensions["drivewise"]
+
+
+def post_fork(server, worker):
+    _services(server).start()
+
+
+def worker_exit(server, worker):
+    from metrics import REGISTRY
+    _services(server).shutdown()
+    REGISTRY.write_snapshot()
+
+
+# Runs in the master for every worker that exits, killed ones included;
+# the master's registry was configured when it preloaded the app
+def child_exit(server, worker):
+    from metrics import REGISTRY
+    REGISTRY.mark_process_dead(worker.pid)
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # optional; without Pillow only originals are served
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Variant name -> longest side in pixels. Variants are WebP files named
+# "<original filename>.<variant>.webp", e.g. "3f9a...c1.jpg.thumb.webp".
+VARIANTS = {"thumb": 400, "large": 1600}
+
+
+class UploadError(ValueError):
+    pass
+
+
+def variant_filename(filename, variant):
+    return f"{filename}.{variant}.webp"
+
+
+# The original a variant was generated from, or None for originals
+def original_filename(filename):
+    parts = filename.rsplit(".", 3)
+    if len(parts) == 4 and parts[3] == "webp" and parts[2] in VARIANTS:
+        return f"{parts[0]}.{parts[1]}"
+    return None
+
+
+class ImageStore:
+    # Content-addressed uploads: files are named by the sha256 of their
+    # bytes, so a re-upload of the same image reuses the stored file.
+    # Uploads are copied to disk in chunks while hashing; resized WebP
+    # variants are generated on a background pool and the URLs returned
+    # up front (until a variant exists, uploaded_file() serves the original).
+    def __init__(self, root, url_prefix="/uploads", max_size=5 * 1024 * 1024,
+                 allowed_extensions=("png", "jpg", "jpeg", "gif"), workers=2):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.max_size = max_size
+        self.allowed_extensions = set(allowed_extensions)
+        self.workers = workers
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def url(self, filename):
+        return f"{self.url_prefix}/{filename}"
+
+    def filename_from_url(self, url):
+        if not url or not url.startswith(self.url_prefix + "/"):
+            return None
+        return os.path.basename(url)
+
+    def save(self, file):
+        ext = file.filename.rsplit(".", 1)[1].lower() if "." in (file.filename or "") else ""
+        if ext not in self.allowed_extensions:
+            raise UploadError(f"Invalid file type for {file.filename}. Allowed: {', '.join(sorted(self.allowed_extensions))}")
+
+        digest, size = hashlib.sha256(), 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = file.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise UploadError(f"File {file.filename} exceeds {self.max_size // (1024 * 1024)}MB limit")
+                    digest.update(chunk)
+                    out.write(chunk)
+            filename = f"{digest.hexdigest()}.{ext}"
+            path = os.path.join(self.root, filename)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                # Fresh mtime keeps the reaper's sweep off a file that is
+                # about to be referenced again
+                os.utime(path)
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        variants = {}
+        if Image is not None:
+            pending = [v for v in VARIANTS if not os.path.exists(os.path.join(self.root, variant_filename(filename, v)))]
+            if pending:
+                self._executor().submit(self._make_variants, filename, pending)
+            variants = {v: self.url(variant_filename(filename, v)) for v in VARIANTS}
+        return {"filename": filename, "url": self.url(filename), "variants": variants}
+
+    def thumbnail_url(self, url):
+        filename = self.filename_from_url(url)
+        if filename is None or Image is None:
+            return url
+        return self.url(variant_filename(filename, "thumb"))
+
+    # Removes a stored original and its variants. Callers check first that
+    # no other document still references the content address.
+    def delete(self, url):
+        filename = self.filename_from_url(url)
+        if filename is None:
+            return
+        for name in [filename] + [variant_filename(filename, v) for v in VARIANTS]:
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-variants")
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _make_variants(self, filename, variants):
+        try:
+            with Image.open(os.path.join(self.root, filename)) as image:
+                image.load()
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+                for variant in variants:
+                    size = VARIANTS[variant]
+                    resized = image.copy()
+                    resized.thumbnail((size, size))
+                    target = os.path.join(self.root, variant_filename(filename, variant))
+                    fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".variant-")
+                    try:
+                        with os.fdopen(fd, "wb") as out:
+                            resized.save(out, "WEBP", quality=80, method=4)
+                        os.replace(tmp_path, target)
+                    finally:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+        except Exception as e:
+            logger.error(f"Could not generate variants for {filename}: {e}")
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
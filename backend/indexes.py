@@ -0,0 +1,62 @@
+import logging
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Every get_cars() filter + sort combination gets an index laid out
+# equality fields first, then the sort field, then _id as the tie-breaker
+# used by keyset pagination. Price ranges ride on the price-sorted indexes;
+# descending sorts walk the same indexes backwards.
+CAR_EQUALITY_PREFIXES = [[], ["category"], ["featured"], ["featured", "category"]]
+CAR_SORT_FIELDS = ["price", "year"]
+
+
+def car_index_models():
+    models = []
+    for prefix in CAR_EQUALITY_PREFIXES:
+        for sort_field in CAR_SORT_FIELDS:
+            keys = [(field, ASCENDING) for field in prefix] + [(sort_field, ASCENDING), ("_id", ASCENDING)]
+            models.append(IndexModel(keys, name="_".join(field for field, _ in keys)))
+    models.append(IndexModel([("seller_email", ASCENDING)], name="seller_email"))
+    # Content-addressed uploads are shared; deletes check for other references
+    models.append(IndexModel([("images", ASCENDING)], name="images"))
+    # Name search: anchored prefixes on the normalized name and its words
+    models.append(IndexModel([("name_lower", ASCENDING)], name="name_lower"))
+    models.append(IndexModel([("search_tokens", ASCENDING)], name="search_tokens"))
+    # Recommendations: listings of one model inside a price band
+    models.append(IndexModel([("model_key", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)],
+                             name="model_key_price__id"))
+    # The reaper's scan for expired tombstones; only deleted listings are indexed
+    models.append(IndexModel([("deletedAt", ASCENDING)], name="deletedAt_tombstones",
+                             partialFilterExpression={"deleted": True}))
+    return models
+
+
+def user_index_models():
+    return [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("profilePicture", ASCENDING)], name="profilePicture")
+    ]
+
+
+# Idempotent; safe to run on every startup. A failing index (e.g. the
+# unique email index while duplicates are stored) is logged and skipped;
+# every other index is still created. Returns whether all of them were.
+def ensure_indexes(db):
+    ok = True
+    for collection, models in ((db["users"], user_index_models()), (db["cars"], car_index_models())):
+        try:
+            collection.create_indexes(models)
+        except OperationFailure:
+            # Retry one by one so only the offending index is missing
+            for model in models:
+                try:
+                    collection.create_indexes([model])
+                except OperationFailure as e:
+                    logger.error(f"Could not create index {model.document['name']} on {collection.name}: {e}")
+                    ok = False
+    if ok:
+        logger.info("Created MongoDB indexes for users and cars collections")
+    return ok
@@ -0,0 +1,150 @@
+import numpy as np
+
+# Feature layout expected by the Random Forest model (training column order)
+FEATURE_COLUMNS = [
+    "Price", "Model Year", "Engine Type", "Engine Capacity",
+    "Assembly", "Body Type", "Transmission Type", "Registration Status"
+]
+NUMERIC_COLUMNS = ["Price", "Model Year", "Engine Capacity"]
+# Fallback vocabularies for models trained before feature_schema.json
+# existed. Those models were fit on LabelEncoder codes, i.e. each column's
+# values in sorted order, so the lists are kept sorted here.
+CATEGORICAL_MAPPINGS = {
+    "Assembly": ["Imported", "Local"],
+    "Body Type": ["Cross Over", "Hatchback", "Mini Van", "SUV", "Sedan", "Van"],
+    "Engine Type": ["Diesel", "Hybrid", "Petrol"],
+    "Registration Status": ["Registered", "Un-Registered"],
+    "Transmission Type": ["Automatic", "Manual"]
+}
+
+
+class FeatureEncodingError(ValueError):
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.message = message
+        self.index = index
+
+
+class FeatureEncoder:
+    # Encodes prediction records straight into a float matrix. Category codes
+    # come from lookup tables built once, so encoding a batch is one pass per
+    # column with no DataFrame in between.
+    def __init__(self, columns=FEATURE_COLUMNS, numeric_columns=NUMERIC_COLUMNS,
+                 categorical_mappings=CATEGORICAL_MAPPINGS):
+        self.columns = list(columns)
+        self.numeric_columns = set(numeric_columns)
+        self.categorical_mappings = {col: list(values) for col, values in categorical_mappings.items()}
+        self.lookups = {
+            col: {value: code for code, value in enumerate(values)}
+            for col, values in self.categorical_mappings.items()
+        }
+        missing = [col for col in self.columns if col not in self.numeric_columns and col not in self.lookups]
+        if missing:
+            raise ValueError(f"No encoding defined for columns: {missing}")
+
+    def encode_one(self, record):
+        return self.encode([record])
+
+    def encode(self, records):
+        n_rows = len(records)
+        X = np.empty((n_rows, len(self.columns)), dtype=np.float64)
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise FeatureEncodingError("Each record must be a JSON object", index)
+            for col in self.columns:
+                if col not in record:
+                    raise FeatureEncodingError(f"{col} is required", index)
+
+        for j, col in enumerate(self.columns):
+            values = [record[col] for record in records]
+            if col in self.numeric_columns:
+                X[:, j] = self._encode_numeric(col, values)
+            else:
+                X[:, j] = self._encode_categorical(col, values)
+        return X
+
+    def _encode_numeric(self, col, values):
+        try:
+            column = np.array(values, dtype=np.float64)
+        except (ValueError, TypeError):
+            column = None
+        if column is not None and column.shape == (len(values),):
+            # numpy maps None to NaN where float() would refuse it
+            suspects = np.flatnonzero(np.isnan(column))
+        else:
+            suspects = range(len(values))
+        # Slow path only to locate the offending row for the error message
+        for index in suspects:
+            try:
+                float(values[index])
+            except (ValueError, TypeError):
+                raise FeatureEncodingError(f"{col} must be a number", int(index))
+        if column is None or column.shape != (len(values),):
+            raise FeatureEncodingError(f"{col} must be a number")
+        return column
+
+    def _encode_categorical(self, col, values):
+        lookup = self.lookups[col]
+        codes = np.fromiter(
+            (lookup.get(value, -1) if isinstance(value, str) else -1 for value in values),
+            dtype=np.float64, count=len(values)
+        )
+        bad = np.flatnonzero(codes < 0)
+        if bad.size:
+            raise FeatureEncodingError(
+                f"Invalid value for {col}. Expected one of: {self.categorical_mappings[col]}", int(bad[0])
+            )
+        return codes
+
+
+class CarPredictor:
+    # Wraps the fitted forest and the car name encoder so that a whole batch
+    # is scored with a single predict_proba call and decoded with one take().
+    def __init__(self, model, label_encoder, encoder=None):
+        columns = getattr(model, "feature_names_in_", None)
+        if encoder is None:
+            encoder = FeatureEncoder(columns=list(columns) if columns is not None else FEATURE_COLUMNS)
+        elif columns is not None and list(columns) != encoder.columns:
+            raise ValueError(f"Encoder columns {encoder.columns} do not match model columns {list(columns)}")
+        if columns is not None:
+            # Column order is checked once above; dropping the names keeps
+            # sklearn from re-validating them on every ndarray call.
+            del model.feature_names_in_
+        self.model = model
+        self.encoder = encoder
+        self.classes = np.asarray(model.classes_)
+        self.labels = np.asarray(label_encoder.classes_)[self.classes.astype(np.intp)]
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(X)
+
+    def decode(self, proba):
+        return self.labels[proba.argmax(axis=1)]
+
+    def predict(self, X):
+        return self.decode(self.predict_proba(X))
+
+    def top_k(self, proba, k):
+        # Highest-probability car names for each row, best first
+        proba = np.atleast_2d(proba)
+        k = min(k, proba.shape[1])
+        order = np.argsort(-proba, axis=1, kind="stable")[:, :k]
+        return [
+            [{"car_name": str(self.labels[j]), "probability": round(float(row[j]), 4)} for j in idx]
+            for row, idx in zip(proba, order)
+        ]
+
+    def warm(self, rows=64):
+        # One pass over every category value so the first real request does
+        # not pay for page faults or lazy initialisation
+        records = []
+        for i in range(rows):
+            record = {}
+            for col in self.encoder.columns:
+                values = self.encoder.categorical_mappings.get(col)
+                record[col] = values[i % len(values)] if values else float(i)
+            records.append(record)
+        self.predict_records(records)
+
+    def predict_records(self, records):
+        return self.predict(self.encoder.encode(records))
@@ -0,0 +1,216 @@
+# Durable local job queue for listing and profile writes.
+#
+# Jobs are rows in one SQLite file that every worker process on the host
+# shares, so a queued write survives a restart. Each process runs a few
+# threads that claim queued jobs in batches (oldest first) and hand each
+# kind's share of the batch to its handler in one call, so a burst of
+# requests turns into a few large bulk writes rather than many small ones.
+#
+# A claimed job holds a lease. If its process dies the job is claimed again
+# once the lease runs out (up to max_attempts times), so handlers must be
+# safe to repeat; a batch holding such a job is run with retry=True.
+# Finished jobs are kept for retention seconds for the
+# status endpoint, then pruned.
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+# A handler's verdict on one job that cannot succeed (a listing deleted
+# before its update ran, say); status is the HTTP status to report
+class JobFailed(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class JobQueue:
+    # handlers maps a job kind to a function that takes a list of payloads
+    # and returns one result per payload: a JSON-able value, or a JobFailed.
+    # If the handler raises, the whole batch is retried. retry tells the
+    # handler that some of the writes may already have gone through.
+    def __init__(self, path, handlers, workers=2, batch_size=200, max_wait=0.02, poll_interval=0.1,
+                 lease=60, max_attempts=3, max_pending=10000, retention=86400):
+        self.path = path
+        self.handlers = handlers
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.retention = retention
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._last_prune = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT, owner TEXT, payload TEXT, "
+            "status TEXT, result TEXT, attempts INTEGER DEFAULT 0, lease_until REAL, created REAL, updated REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def submit(self, kind, payload, owner):
+        if kind not in self.handlers:
+            raise ValueError(f"No handler for job kind {kind}")
+        conn = self._connect()
+        if self.max_pending and self.pending() >= self.max_pending:
+            raise QueueFull(f"{self.max_pending} jobs already queued")
+        job_id, now = uuid.uuid4().hex, time.time()
+        conn.execute(
+            "INSERT INTO jobs (id, kind, owner, payload, status, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, owner, json_util.dumps(payload), QUEUED, now, now)
+        )
+        self._wake.set()
+        return job_id
+
+    def pending(self):
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    # The job's state as the status endpoint reports it, or None if it does
+    # not exist (or belongs to someone else)
+    def status(self, job_id, owner):
+        row = self._connect().execute(
+            "SELECT kind, status, result, attempts, created, updated FROM jobs WHERE id = ? AND owner = ?",
+            (job_id, owner)
+        ).fetchone()
+        if row is None:
+            return None
+        kind, status, result, attempts, created, updated = row
+        job = {"id": job_id, "kind": kind, "status": status, "attempts": attempts,
+               "createdAt": created, "updatedAt": updated}
+        if result is not None:
+            job.update(json_util.loads(result))
+        return job
+
+    # Runs the handler for one job right away, bypassing the queue; returns
+    # its result or raises JobFailed
+    def run_now(self, kind, payload):
+        result = self.handlers[kind]([payload], retry=False)[0]
+        if isinstance(result, JobFailed):
+            raise result
+        return result
+
+    # Claims and runs one batch; returns the number of jobs handled
+    def run_once(self):
+        jobs = self._claim()
+        if not jobs:
+            self._prune()
+            return 0
+        kinds = {}
+        for job in jobs:
+            kinds.setdefault(job[1], []).append(job)
+        finished = []
+        for kind, batch in kinds.items():
+            try:
+                results = self.handlers[kind]([payload for _, _, payload, _ in batch],
+                                              retry=any(attempts > 1 for _, _, _, attempts in batch))
+            except Exception as e:
+                logger.error(f"{kind} batch of {len(batch)} jobs failed: {str(e)}")
+                for job_id, _, _, attempts in batch:
+                    if attempts < self.max_attempts:
+                        finished.append((QUEUED, None, job_id))
+                    else:
+                        finished.append((FAILED, json_util.dumps({"error": "Write failed", "code": 500}), job_id))
+                continue
+            for (job_id, _, _, _), result in zip(batch, results):
+                if isinstance(result, JobFailed):
+                    finished.append((FAILED, json_util.dumps({"error": result.message, "code": result.status}), job_id))
+                else:
+                    finished.append((DONE, json_util.dumps({"result": result}), job_id))
+        now = time.time()
+        self._connect().executemany(
+            "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, updated = ? WHERE id = ?",
+            [(status, result, now, job_id) for status, result, job_id in finished]
+        )
+        return len(jobs)
+
+    def _claim(self):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose process died on every attempt are given up on
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, updated = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, json_util.dumps({"error": "Write did not complete", "code": 500}), now,
+                 RUNNING, now, self.max_attempts)
+            )
+            rows = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs "
+                "WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY rowid LIMIT ?",
+                (QUEUED, RUNNING, now, self.batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, updated = ? WHERE id = ?",
+                [(RUNNING, now + self.lease, now, row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [(job_id, kind, json_util.loads(payload), attempts + 1) for job_id, kind, payload, attempts in rows]
+
+    def _prune(self):
+        if time.monotonic() - self._last_prune < 60:
+            return
+        self._last_prune = time.monotonic()
+        self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, time.time() - self.retention)
+        )
+
+    def start(self):
+        if self.workers <= 0 or self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker pass failed: {str(e)}")
+            # Idle: wait for a submission in this process (or poll for
+            # other processes'), then give a burst max_wait to fill a batch
+            if self._wake.wait(self.poll_interval):
+                self._wake.clear()
+                self._stop.wait(self.max_wait)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
@@ -0,0 +1,207 @@
+import csv
+import io
+import json
+
+from pymongo.errors import BulkWriteError
+
+from search import search_fields
+from serialization import dumps
+
+REQUIRED_FIELDS = ["name", "location", "price", "year", "mileage", "fuel", "transmission", "category"]
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/300x200"
+
+# Bulk import/export. Exported CSV re-imports as-is: images are joined with
+# "|" and featured is written as true/false.
+IMPORT_FORMATS = {"csv", "ndjson"}
+EXPORT_FIELDS = ["_id", "name", "location", "price", "year", "mileage", "fuel", "transmission",
+                 "category", "make", "model", "featured", "images"]
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+class ListingValidationError(ValueError):
+    pass
+
+
+# The /api/list-car rules, shared by the bulk import. data is a form, a CSV
+# row or a decoded NDJSON object; returns the document to insert, with the
+# placeholder image until the caller attaches uploads.
+def build_listing(data, seller_email):
+    for field in REQUIRED_FIELDS:
+        if data.get(field) in (None, ""):
+            raise ListingValidationError(f"{field} is required")
+
+    try:
+        price = float(data["price"])
+        year = int(data["year"])
+        mileage = int(data["mileage"])
+    except (ValueError, TypeError):
+        raise ListingValidationError("Price, year, and mileage must be numeric")
+
+    car = {
+        "name": str(data["name"]),
+        "location": str(data["location"]),
+        "price": price,
+        "year": year,
+        "mileage": mileage,
+        "fuel": str(data["fuel"]),
+        "transmission": str(data["transmission"]),
+        "postedDays": 0,
+        "images": [PLACEHOLDER_IMAGE],
+        "thumbnails": [PLACEHOLDER_IMAGE],
+        "featured": str(data.get("featured", "false")).lower() == "true",
+        "make": str(data.get("make") or ""),
+        "model": str(data.get("model") or ""),
+        "category": str(data["category"]),
+        "seller_email": seller_email
+    }
+    car.update(search_fields(car["name"], car["make"], car["model"]))
+    return car
+
+
+# Picks csv or ndjson from ?format= or the request content type
+def import_format(explicit, mimetype):
+    fmt = (explicit or "").lower()
+    if not fmt:
+        fmt = "ndjson" if mimetype in ("application/x-ndjson", "application/jsonl", "application/json") else "csv"
+    if fmt == "jsonl":
+        fmt = "ndjson"
+    if fmt not in IMPORT_FORMATS:
+        raise ListingValidationError(f"Unsupported format: {fmt}")
+    return fmt
+
+
+# Yields (row number, data) from a binary stream one record at a time; a
+# record that cannot be decoded yields a ListingValidationError instead of
+# data. CSV row numbers are file lines, so the header is line 1.
+def read_rows(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="" if fmt == "csv" else None)
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, ListingValidationError("Too many columns")
+            else:
+                yield reader.line_num, row
+        return
+
+    for line_num, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield line_num, ListingValidationError("Invalid JSON")
+            continue
+        if not isinstance(data, dict):
+            yield line_num, ListingValidationError("Each line must be a JSON object")
+            continue
+        yield line_num, data
+
+
+def _imported_images(data, image_store):
+    images = data.get("images")
+    if images in (None, "", []):
+        return None
+    if isinstance(images, str):
+        images = [url.strip() for url in images.split("|") if url.strip()]
+    if not isinstance(images, list) or not all(isinstance(url, str) for url in images):
+        raise ListingValidationError("images must be a list of URLs")
+    for url in images:
+        if not url.startswith(("http://", "https://")) and image_store.filename_from_url(url) is None:
+            raise ListingValidationError(f"Unsupported image URL: {url}")
+    return images
+
+
+# Validates and inserts rows in unordered insert_many batches, so only one
+# batch is held in memory and one bad row never aborts the rest. on_batch
+# receives the documents that were actually written. Returns
+# {"imported", "failed", "errors": [{"row", "error"}], "truncated"}, keeping
+# at most max_errors error entries.
+def import_listings(rows, seller_email, cars_collection, image_store, on_batch=None,
+                    batch_size=500, max_errors=1000):
+    summary = {"imported": 0, "failed": 0, "errors": [], "truncated": False}
+
+    def fail(row, error):
+        summary["failed"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append({"row": row, "error": error})
+        else:
+            summary["truncated"] = True
+
+    def flush(batch, batch_rows):
+        try:
+            cars_collection.insert_many(batch, ordered=False)
+            inserted = batch
+        except BulkWriteError as e:
+            failed = {}
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = error.get("errmsg", "Write failed")
+            for index in sorted(failed):
+                fail(batch_rows[index], failed[index])
+            inserted = [car for index, car in enumerate(batch) if index not in failed]
+        summary["imported"] += len(inserted)
+        if on_batch and inserted:
+            on_batch(inserted)
+
+    batch, batch_rows = [], []
+    for row, data in rows:
+        try:
+            if isinstance(data, Exception):
+                raise data
+            car = build_listing(data, seller_email)
+            images = _imported_images(data, image_store)
+        except ListingValidationError as e:
+            fail(row, str(e))
+            continue
+        if images:
+            car["images"] = images
+            car["thumbnails"] = [image_store.thumbnail_url(url) for url in images]
+        batch.append(car)
+        batch_rows.append(row)
+        if len(batch) >= batch_size:
+            flush(batch, batch_rows)
+            batch, batch_rows = [], []
+    if batch:
+        flush(batch, batch_rows)
+    return summary
+
+
+class _Buffer:
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        data = data.encode("utf-8") if isinstance(data, str) else data
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def _csv_row(car):
+    row = dict(car)
+    row["images"] = "|".join(car.get("images") or [])
+    row["featured"] = "true" if car.get("featured") else "false"
+    return row
+
+
+# Streams listings from a cursor as CSV or NDJSON in ~64KiB chunks
+def export_listings(cars, fmt):
+    buffer = _Buffer()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+    for car in cars:
+        if writer:
+            writer.writerow(_csv_row(car))
+        else:
+            buffer.write(dumps(car) + b"\n")
+        if buffer.size >= EXPORT_CHUNK_SIZE:
+            yield buffer.take()
+    if buffer.size:
+        yield buffer.take()
@@ -0,0 +1,325 @@
+# Request and stage latency histograms, exposed at /metrics in the
+# Prometheus text format:
+#
+#   drivewise_request_seconds{route,method,status}   every Flask request
+#   drivewise_stage_seconds{stage}                    mongo, bcrypt, encode, model,
+#                                                     decode, serialize, file_io
+#   drivewise_mongo_command_seconds{command}          every MongoDB command
+#
+# An observation is a bisect and two additions under a lock, cheap enough
+# to leave on in production. Each process keeps its own series; under
+# gunicorn set METRICS_DIR and every worker writes a snapshot there at most
+# once a second, which /metrics merges, so any worker answers for all. When
+# a worker exits, the master folds its snapshot into totals.json there and
+# removes it, so recycled workers neither pile up files nor lose their
+# counts to a new worker that reuses the pid.
+#
+# SlowRequestProfiler is the opt-in part (PROFILE_SLOW_MS): requests slower
+# than the threshold leave their sampled stacks in PROFILE_DIR as collapsed
+# stacks, ready for flamegraph.pl or speedscope.
+import bisect
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request
+from pymongo import monitoring
+
+try:
+    import fcntl
+except ImportError:  # Windows: no gunicorn, so no other workers to race
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+HELP = {
+    "drivewise_request_seconds": "Flask request latency by route",
+    "drivewise_stage_seconds": "Time spent in one stage of a request",
+    "drivewise_mongo_command_seconds": "MongoDB command latency by command",
+}
+TOTALS_FILENAME = "totals.json"
+LOCK_FILENAME = ".metrics.lock"
+
+
+class Registry:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.snapshot_dir = None
+        self.snapshot_interval = 1
+        self._series = {}
+        self._lock = threading.Lock()
+        self._last_snapshot = 0
+        if hasattr(os, "register_at_fork"):
+            # A forked worker starts empty; whatever the pre-fork master
+            # observed (startup queries) is not the worker's to report
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._series = {}
+        self._lock = threading.Lock()
+        self._last_snapshot = 0
+
+    def configure(self, snapshot_dir=None, snapshot_interval=1):
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_interval = snapshot_interval
+
+    # labels is a tuple of (name, value) pairs; series are created on first use
+    def observe(self, name, labels, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get((name, labels))
+            if series is None:
+                series = self._series[(name, labels)] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("drivewise_stage_seconds", (("stage", stage),), time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    # Called after each request; writes this process's series for the
+    # other workers' /metrics at most once per snapshot_interval
+    def maybe_write_snapshot(self):
+        if not self.snapshot_dir or time.monotonic() - self._last_snapshot < self.snapshot_interval:
+            return
+        self.write_snapshot()
+
+    # The final write on worker exit goes through here, whatever the interval
+    def write_snapshot(self):
+        if not self.snapshot_dir:
+            return
+        self._last_snapshot = time.monotonic()
+        self._write(f"{os.getpid()}.json", self.snapshot())
+
+    # Adds an exited worker's snapshot to the totals and removes it; called
+    # by the gunicorn master for every worker it reaps
+    def mark_process_dead(self, pid):
+        if not self.snapshot_dir:
+            return
+        path = os.path.join(self.snapshot_dir, f"{pid}.json")
+        if not os.path.exists(path):
+            return
+        with self._locked(exclusive=True):
+            totals = self._read(os.path.join(self.snapshot_dir, TOTALS_FILENAME)) or {}
+            _add(totals, self._read(path) or {})
+            if self._write(TOTALS_FILENAME, totals):
+                os.remove(path)
+
+    def _write(self, filename, series):
+        payload = [[name, list(labels), values] for (name, labels), values in series.items()]
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_dir, prefix=".metrics-")
+            with os.fdopen(fd, "w") as out:
+                json.dump({"buckets": list(self.buckets), "series": payload}, out)
+            os.replace(tmp_path, os.path.join(self.snapshot_dir, filename))
+            return True
+        except OSError as e:
+            logger.error(f"Could not write metrics snapshot: {str(e)}")
+            return False
+
+    # A snapshot file's series, or None if it is unreadable or was written
+    # with other buckets
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("buckets") != list(self.buckets):
+            return None
+        return {(metric, tuple(tuple(pair) for pair in labels)): series for metric, labels, series in data["series"]}
+
+    # Readers share the lock; a fold holds it alone, so a scrape never sees
+    # a dead worker's series both in the totals and in its own file
+    @contextmanager
+    def _locked(self, exclusive):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.snapshot_dir, LOCK_FILENAME), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _merged(self):
+        merged = self.snapshot()
+        if not self.snapshot_dir:
+            return merged
+        own = f"{os.getpid()}.json"
+        with self._locked(exclusive=False):
+            for name in os.listdir(self.snapshot_dir):
+                if name == own or not name.endswith(".json"):
+                    continue
+                _add(merged, self._read(os.path.join(self.snapshot_dir, name)) or {})
+        return merged
+
+    def render(self):
+        lines, seen = [], set()
+        for (name, labels), series in sorted(self._merged().items()):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], series[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {series[-1]:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _add(total, series):
+    for key, values in series.items():
+        merged = total.setdefault(key, [0] * len(values[:-1]) + [0.0])
+        for i, value in enumerate(values):
+            merged[i] += value
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+timed = REGISTRY.timed
+
+
+# Times every MongoDB command through pymongo's monitoring API; pass it in
+# the client's event_listeners
+class MongoCommandTimer(monitoring.CommandListener):
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        self._observe(event)
+
+    def _observe(self, event):
+        seconds = event.duration_micros / 1e6
+        self.registry.observe("drivewise_mongo_command_seconds", (("command", event.command_name),), seconds)
+        self.registry.observe("drivewise_stage_seconds", (("stage", "mongo"),), seconds)
+
+
+class SlowRequestProfiler:
+    # While requests are in flight a daemon thread samples their stacks
+    # every interval seconds; a request that took longer than threshold
+    # seconds gets its samples written to out_dir as "frame;frame;... count"
+    # lines. Costs nothing measurable between samples.
+    def __init__(self, out_dir, threshold, interval=0.005):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.threshold = threshold
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def begin(self):
+        if self._thread is None or self._pid != os.getpid():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid():
+                    # Threads do not survive fork(); each worker starts its own
+                    self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+                    self._pid = os.getpid()
+                    self._thread.start()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def end(self, name, elapsed):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if samples and elapsed >= self.threshold:
+            self._write(name, elapsed, samples)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_stack(frame)] += 1
+
+    def _write(self, name, elapsed, samples):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_") or "root"
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-"
+                                          f"{slug}-{elapsed * 1000:.0f}ms.folded")
+        try:
+            with open(path, "w") as out:
+                for stack, count in samples.most_common():
+                    out.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.error(f"Could not write profile {path}: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+
+
+def _stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+# Request timing (and profiling, if given) for every route of a Flask app
+def instrument(app, registry=REGISTRY, profiler=None):
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        if profiler:
+            profiler.begin()
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe_request(exc):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        status = str(g.pop("metrics_status", 500))
+        registry.observe("drivewise_request_seconds",
+                         (("route", route), ("method", request.method), ("status", status)), elapsed)
+        if profiler:
+            profiler.end(f"{request.method} {route}", elapsed)
+        registry.maybe_write_snapshot()
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+import joblib
+
+from batching import InferenceBatcher
+from feature_schema import encoder_from_schema, load_feature_schema
+from forest_compiler import load_compiled_forest
+from inference import CarPredictor
+
+logger = logging.getLogger(__name__)
+
+
+# Identifies a model file version without reading it
+def file_fingerprint(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ModelBundle:
+    # One loaded model version: predictor, its own micro-batcher and the
+    # file fingerprints it was loaded from
+    def __init__(self, version, predictor, batcher, fingerprints, source):
+        self.version = version
+        self.predictor = predictor
+        self.batcher = batcher
+        self.fingerprints = fingerprints
+        self.source = source
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+
+    def describe(self):
+        return {"version": self.version, "source": self.source, "loaded_at": self.loaded_at}
+
+
+class ModelFiles:
+    def __init__(self, model_path, encoder_path, forest_path, schema_path, use_compiled=True):
+        self.model_path = model_path
+        self.encoder_path = encoder_path
+        self.forest_path = forest_path
+        self.schema_path = schema_path
+        self.use_compiled = use_compiled
+
+    @property
+    def paths(self):
+        return [self.model_path, self.encoder_path, self.forest_path, self.schema_path]
+
+    def fingerprints(self):
+        return tuple(file_fingerprint(path) for path in self.paths)
+
+
+def load_model_bundle(files, batcher_options=None):
+    fingerprints = files.fingerprints()
+    # The compiled forest is memory-mapped, so workers share its pages
+    if files.use_compiled and os.path.exists(files.forest_path):
+        model = load_compiled_forest(files.forest_path)
+        source = files.forest_path
+    else:
+        model = joblib.load(files.model_path)
+        source = files.model_path
+    label_encoder = joblib.load(files.encoder_path)
+
+    # Encode requests with the vocabularies the model was trained on
+    if os.path.exists(files.schema_path):
+        feature_schema = load_feature_schema(files.schema_path)
+        encoder = encoder_from_schema(feature_schema)
+    else:
+        logger.warning(f"Feature schema not found at {files.schema_path}, using built-in category codes")
+        encoder = None
+    predictor = CarPredictor(model, label_encoder, encoder)
+    predictor.warm()
+
+    version = hashlib.sha1(repr(fingerprints).encode("utf-8")).hexdigest()[:12]
+    batcher = InferenceBatcher(predictor.predict_proba, **(batcher_options or {}))
+    return ModelBundle(version, predictor, batcher, fingerprints, source)
+
+
+class ModelRegistry:
+    # Holds the serving model and the one before it. New versions are loaded
+    # and warmed off the request path, then swapped in with a single
+    # reference assignment; requests read `current` once and keep using that
+    # bundle, so a swap never stalls or splits an in-flight prediction.
+    #
+    # Every worker process has its own registry. A rollback is recorded in
+    # pin_path (the files rolled back from); each worker's watcher skips
+    # those files and rolls back itself if it is serving them, and a reload
+    # removes the pin again. Without a watcher the admin endpoints only
+    # reach the worker that answers them.
+    def __init__(self, files, batcher_options=None, poll_interval=0, on_swap=None, pin_path=None):
+        self.files = files
+        self.batcher_options = batcher_options or {}
+        self.poll_interval = poll_interval
+        self.on_swap = on_swap
+        self.pin_path = pin_path
+        self.current = load_model_bundle(files, self.batcher_options)
+        self.previous = None
+        self.last_error = None
+        self._skip_fingerprints = None
+        self._pinned = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+        self._stop = threading.Event()
+        logger.info(f"Serving model {self.current.version} from {self.current.source}")
+
+    def reload(self, wait=False):
+        self._write_pin(None)
+        thread = threading.Thread(target=self._reload, name="model-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    def rollback(self):
+        with self._reload_lock:
+            if self.previous is None:
+                return None
+            # Keep the watchers from re-loading the files just rolled back
+            # from; the other workers see the pin and roll back too
+            self._write_pin(self.current.fingerprints)
+            self._rollback()
+            return self.current
+
+    def start_watching(self):
+        if self.poll_interval <= 0:
+            return
+        # Threads do not survive fork, so each worker starts its own watcher
+        if self._watcher is not None and self._watcher_pid == os.getpid() and self._watcher.is_alive():
+            return
+        self._watcher_pid = os.getpid()
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    # Stops the watcher and drains the batchers; used on worker shutdown
+    def close(self):
+        self._stop.set()
+        if self._watcher is not None and self._watcher_pid == os.getpid():
+            self._watcher.join(timeout=self.poll_interval + 1)
+        for bundle in (self.current, self.previous):
+            if bundle is not None:
+                bundle.batcher.close()
+
+    def status(self):
+        return {
+            "current": self.current.describe(),
+            "previous": self.previous.describe() if self.previous else None,
+            "watching": self.poll_interval > 0,
+            "rolled_back": self._read_pin() is not None,
+            "last_error": self.last_error,
+        }
+
+    def _rollback(self):
+        self._swap(self.previous, keep_previous=self.current)
+        logger.info(f"Rolled back to model {self.current.version}")
+
+    def _write_pin(self, fingerprints):
+        self._pinned = fingerprints
+        if not self.pin_path:
+            return
+        try:
+            if fingerprints is None:
+                if os.path.exists(self.pin_path):
+                    os.remove(self.pin_path)
+                return
+            tmp_path = f"{self.pin_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as out:
+                json.dump({"rolled_back_from": fingerprints}, out)
+            os.replace(tmp_path, self.pin_path)
+        except OSError as e:
+            logger.error(f"Could not update model pin {self.pin_path}, other workers will not follow: {str(e)}")
+
+    # Fingerprints of the files rolled back from, or None
+    def _read_pin(self):
+        if not self.pin_path:
+            return self._pinned
+        try:
+            with open(self.pin_path) as f:
+                pinned = json.load(f)["rolled_back_from"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            return self._pinned
+        return tuple(tuple(fingerprint) if fingerprint else None for fingerprint in pinned)
+
+    def _reload(self):
+        with self._reload_lock:
+            try:
+                bundle = load_model_bundle(self.files, self.batcher_options)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._skip_fingerprints = self.files.fingerprints()
+                logger.error(f"Model reload failed, keeping {self.current.version}: {self.last_error}")
+                return
+            self.last_error = None
+            if bundle.version == self.current.version:
+                bundle.batcher.close()
+                return
+            self._swap(bundle, keep_previous=self.current)
+            logger.info(f"Swapped in model {bundle.version} from {bundle.source}")
+
+    def _swap(self, bundle, keep_previous):
+        evicted = self.previous if self.previous not in (bundle, keep_previous) else None
+        self.current = bundle
+        self.previous = keep_previous
+        if evicted is not None:
+            evicted.batcher.close()
+        if self.on_swap is not None:
+            self.on_swap(bundle)
+
+    def _watch(self):
+        # A change must be stable for one full interval before it is loaded,
+        # so a trainer that is still writing files is not picked up halfway
+        seen = self.files.fingerprints()
+        while not self._stop.wait(self.poll_interval):
+            pinned = self._read_pin()
+            if pinned is not None and pinned == self.current.fingerprints:
+                # Another worker rolled back from the version served here
+                with self._reload_lock:
+                    if self.previous is not None and self.current.fingerprints == pinned:
+                        self._rollback()
+            fingerprints = self.files.fingerprints()
+            if fingerprints != seen:
+                seen = fingerprints
+                continue
+            if fingerprints not in (self.current.fingerprints, self._skip_fingerprints, pinned):
+                self._reload()
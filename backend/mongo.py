@@ -0,0 +1,50 @@
+import os
+import threading
+
+from pymongo import MongoClient
+
+
+def pool_options_from_env():
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 32)),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000)),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000)),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000)),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000)),
+    }
+
+
+class MongoConnection:
+    # MongoClient is not fork-safe, so the client is created on first use in
+    # each process: a pre-fork master that bootstraps indexes closes its
+    # client, and every worker opens its own pool of maxPoolSize sockets
+    # (size it to the worker's thread count).
+    def __init__(self, uri, db_name="drivewise", **client_options):
+        self.uri = uri
+        self.db_name = db_name
+        self.client_options = client_options
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        client = self._client
+        if client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = MongoClient(self.uri, **self.client_options)
+                    self._pid = os.getpid()
+                client = self._client
+        return client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from metrics import timed
+
+
+class PasswordPoolBusy(RuntimeError):
+    pass
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def _pool_context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def hash_rounds(hashed):
+    try:
+        return int(bytes(hashed).split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    # bcrypt runs in a small process pool so a burst of logins burns those
+    # cores instead of the request workers. At most max_pending calls may be
+    # queued or running; beyond that PasswordPoolBusy is raised at once so
+    # the endpoint can answer 429 instead of piling up requests. workers=0
+    # hashes inline on the calling thread.
+    def __init__(self, rounds=12, workers=None, max_pending=None, timeout=30):
+        self.rounds = rounds
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(self.workers, 1) * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        return self._run(_hash, password.encode("utf-8"), self.rounds)
+
+    def verify(self, password, hashed):
+        return self._run(_check, password.encode("utf-8"), bytes(hashed))
+
+    # True for hashes made with a different work factor than configured
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy("Password hashing pool is saturated")
+        try:
+            with timed("bcrypt"):
+                if not self.workers:
+                    return fn(*args)
+                return self._executor().submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    def _executor(self):
+        with self._lock:
+            # A pool inherited across fork() has no live workers
+            if self._pool is None or self._pool_pid != os.getpid():
+                # Forking a process that runs threads (job workers, batchers,
+                # the model watcher) can copy a lock held mid-operation into
+                # the child; start pool processes from a clean interpreter
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,225 @@
+# Background cleanup for deleted listings and their uploads.
+#
+# Deleting a listing or an account only tombstones the cars
+# ({"deleted": true, "deletedAt": ...}), which hides them from every read at
+# once. The reaper then, in batches:
+#
+#   - removes tombstones older than tombstone_grace seconds and any uploads
+#     no remaining listing or profile refers to (and that were not stored
+#     again in the last upload_grace seconds)
+#   - sweeps uploads/ every sweep_interval seconds for files nothing refers
+#     to (replaced images, old profile pictures, variants of removed files,
+#     temp files of interrupted uploads) once they are older than
+#     upload_grace seconds, so an upload is never collected before the
+#     listing that uses it is written
+#
+# It runs on a thread in the app (REAPER_INTERVAL, 0 disables) with a lock
+# file so only one process per host does the work, or from cron:
+#
+#   python reaper.py [--uri mongodb://localhost:27017] [--sweep] [--dry-run]
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process runs its own passes
+    fcntl = None
+
+from image_store import ImageStore, original_filename
+from mongo import MongoConnection
+
+logger = logging.getLogger(__name__)
+
+TEMP_PREFIXES = (".upload-", ".variant-")
+LOCK_FILENAME = ".reaper.lock"
+
+
+# $set for a tombstone. BSON dates keep milliseconds, so deletedAt is
+# truncated to match the stored value exactly (delete_account reads the
+# cars it just tombstoned back by it).
+def tombstone():
+    now = datetime.now(timezone.utc)
+    return {"deleted": True, "deletedAt": now.replace(microsecond=now.microsecond // 1000 * 1000)}
+
+
+# Uploads are shared by content address, so a file is only removed once no
+# listing (tombstoned or not) or profile refers to it any more. One $in
+# query per collection for the whole batch.
+def remove_unreferenced(db, image_store, urls, min_age=0, dry_run=False):
+    urls = {url for url in urls if image_store.filename_from_url(url)}
+    if not urls:
+        return []
+    candidates = list(urls)
+    referenced = set(db["cars"].distinct("images", {"images": {"$in": candidates}}))
+    referenced.update(db["users"].distinct("profilePicture", {"profilePicture": {"$in": candidates}}))
+    removed = []
+    for url in sorted(urls - referenced):
+        if min_age and _age(os.path.join(image_store.root, image_store.filename_from_url(url))) < min_age:
+            continue  # stored (again) recently; its listing may not be written yet
+        if not dry_run:
+            try:
+                image_store.delete(url)
+            except OSError as e:
+                logger.error(f"Error deleting image {url}: {str(e)}")
+                continue
+        removed.append(url)
+    return removed
+
+
+def _age(path):
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return float("inf")
+
+
+class Reaper:
+    def __init__(self, mongo, image_store, interval=60, sweep_interval=3600,
+                 tombstone_grace=300, upload_grace=3600, batch_size=500):
+        self.mongo = mongo
+        self.image_store = image_store
+        self.interval = interval
+        self.sweep_interval = sweep_interval
+        self.tombstone_grace = tombstone_grace
+        self.upload_grace = upload_grace
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_sweep = 0
+
+    # Removes expired tombstones batch by batch; returns (listings, files) removed
+    def reap(self, dry_run=False):
+        db = self.mongo.db
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.tombstone_grace)
+        query = {"deleted": True, "deletedAt": {"$lt": cutoff}}
+        listings = files = 0
+        while not self._stop.is_set():
+            batch = list(db["cars"].find(query, {"images": 1}).limit(self.batch_size))
+            if not batch:
+                break
+            if dry_run:
+                listings += len(batch)
+                break
+            result = db["cars"].delete_many({"_id": {"$in": [car["_id"] for car in batch]}, "deleted": True})
+            listings += result.deleted_count
+            urls = [url for car in batch for url in car.get("images", [])]
+            # A file re-uploaded since (fresh mtime) may be about to be
+            # referenced by a new listing; the sweep gets it later if not
+            files += len(remove_unreferenced(db, self.image_store, urls, self.upload_grace))
+        if listings:
+            logger.info(f"Reaped {listings} deleted listings and {files} uploads")
+        return listings, files
+
+    # Garbage-collects uploads/ in batches of batch_size content addresses;
+    # returns the number of files (originals, with their variants) removed
+    def sweep(self, dry_run=False):
+        db = self.mongo.db
+        removed, batch = 0, set()
+        with os.scandir(self.image_store.root) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False) or _age(entry.path) < self.upload_grace:
+                    continue
+                if entry.name.startswith("."):
+                    if entry.name.startswith(TEMP_PREFIXES) and not dry_run:
+                        os.remove(entry.path)
+                    continue
+                batch.add(self.image_store.url(original_filename(entry.name) or entry.name))
+                if len(batch) >= self.batch_size:
+                    removed += len(remove_unreferenced(db, self.image_store, batch, self.upload_grace, dry_run))
+                    batch = set()
+                if self._stop.is_set():
+                    return removed
+        removed += len(remove_unreferenced(db, self.image_store, batch, self.upload_grace, dry_run))
+        if removed:
+            logger.info(f"Swept {removed} unreferenced uploads")
+        return removed
+
+    def run_once(self):
+        with self._lock() as acquired:
+            if not acquired:
+                return
+            self.reap()
+            if self.sweep_interval and time.monotonic() - self._last_sweep >= self.sweep_interval:
+                self.sweep()
+                self._last_sweep = time.monotonic()
+
+    def _lock(self):
+        return _FileLock(os.path.join(self.image_store.root, LOCK_FILENAME))
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reaper", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Reaper pass failed: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# Non-blocking, per-host exclusive lock; a no-op where fcntl is missing
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return True
+        self._file = open(self.path, "a")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="drivewise")
+    parser.add_argument("--uploads", default=os.path.join(os.getcwd(), "uploads"))
+    parser.add_argument("--tombstone-grace", type=float, default=float(os.getenv("TOMBSTONE_GRACE", 300)))
+    parser.add_argument("--upload-grace", type=float, default=float(os.getenv("UPLOAD_GRACE", 3600)))
+    parser.add_argument("--sweep", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    mongo = MongoConnection(args.uri, args.db)
+    reaper = Reaper(mongo, ImageStore(args.uploads), tombstone_grace=args.tombstone_grace,
+                    upload_grace=args.upload_grace)
+    try:
+        listings, files = reaper.reap(dry_run=args.dry_run)
+        print(f"{listings} deleted listings {'due' if args.dry_run else 'reaped'}, {files} uploads removed")
+        if args.sweep:
+            swept = reaper.sweep(dry_run=args.dry_run)
+            print(f"{swept} unreferenced uploads {'found' if args.dry_run else 'removed'}")
+    finally:
+        mongo.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
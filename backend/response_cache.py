@@ -0,0 +1,174 @@
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+
+class LocalCacheBackend:
+    # In-process dict with TTLs; each worker process has its own copy
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class SQLiteCacheBackend:
+    # Local stand-in for a shared cache: one SQLite file that every worker
+    # process on the host reads and writes, so an invalidation in one worker
+    # is seen by all of them
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+        if random.random() < 0.01:
+            conn.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+
+    def counter(self, key):
+        row = self._connect().execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO counters VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,)
+        )
+        return self.counter(key)
+
+
+def create_backend(name, path=None):
+    if name == "sqlite":
+        return SQLiteCacheBackend(path)
+    if name == "local":
+        return LocalCacheBackend()
+    return None
+
+
+class ResponseCache:
+    # Caches whole JSON GET responses. Every entry key embeds the current
+    # generation of the tags it depends on ("cars", "categories"); a write
+    # bumps the generation, which makes every dependent entry unreachable at
+    # once without scanning for keys. Responses carry an ETag so browsers can
+    # revalidate with If-None-Match and get a 304 instead of the payload.
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    # Current generation of a tag; other caches of data behind the tag
+    # (listing totals) put it in their keys to be invalidated along with it
+    def generation(self, tag):
+        return self.backend.counter(f"gen:{tag}") if self.backend is not None else 0
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        for tag in tags:
+            self.backend.incr(f"gen:{tag}")
+
+    def cached(self, tags, key_fn=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = key_fn() if key_fn else normalized_args()
+                if self.backend is None or key is None or request.method != "GET":
+                    return conditional(make_response(view(*args, **kwargs)))
+                generations = ",".join(f"{tag}{self.backend.counter(f'gen:{tag}')}" for tag in tags)
+                cache_key = f"{request.path}|{generations}|{key}"
+                entry = self.backend.get(cache_key)
+                if entry is not None:
+                    self.hits += 1
+                    etag, body = bytes(entry).split(b"\0", 1)
+                    response = Response(body, status=200, mimetype="application/json")
+                    response.set_etag(etag.decode("ascii"))
+                    return conditional(response)
+                self.misses += 1
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    body = response.get_data()
+                    etag = hashlib.sha1(body).hexdigest()
+                    response.set_etag(etag)
+                    self.backend.set(cache_key, etag.encode("ascii") + b"\0" + body, self.ttl)
+                return conditional(response)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalized_args(defaults=None):
+    args = dict(defaults or {})
+    args.update((k, v) for k, v in request.args.items() if v != "")
+    return "&".join(f"{k}={args[k]}" for k in sorted(args))
+
+
+def conditional(response):
+    if response.status_code == 200 and request.method == "GET":
+        if not response.get_etag()[0]:
+            response.add_etag()
+        # Clients may keep the body but must revalidate it with the ETag
+        response.headers.setdefault("Cache-Control", "no-cache")
+        response = response.make_conditional(request)
+    return response
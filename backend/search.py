@@ -0,0 +1,95 @@
+import re
+import unicodedata
+
+from pymongo import UpdateOne
+
+# Listings carry derived fields for name search and recommendations:
+#   name_lower     normalized full name, for "starts with" matches
+#   search_tokens  normalized words of name, make and model (multikey)
+#   model_key      normalized "make model", the form of the model's labels
+# The first two are queried with anchored, case-sensitive prefixes, which
+# MongoDB turns into index range scans instead of a regex over every name;
+# model_key is matched exactly. All are written with every listing write.
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def search_fields(name, make="", model=""):
+    name_lower = normalize_text(name)
+    tokens = set(name_lower.split())
+    tokens.update(normalize_text(make).split())
+    tokens.update(normalize_text(model).split())
+    return {"name_lower": name_lower, "search_tokens": sorted(tokens), "model_key": model_key(name, make)}
+
+
+# The first two words of the name, which is how the training data names
+# models ("Toyota Corolla", "Toyota Land" for a Land Cruiser); the make is
+# put in front when the name leaves it out. Predicted labels map through
+# the same function.
+def model_key(name, make=""):
+    words = normalize_text(name).split()
+    make_words = normalize_text(make).split()
+    if make_words and words[:len(make_words)] != make_words:
+        words = make_words + words
+    return " ".join(words[:2])
+
+
+# Every word but the last must match a token exactly; the last word is a
+# prefix so the filter works while the user is still typing
+def name_filter(text):
+    words = normalize_text(text).split()
+    if not words:
+        return {}
+    condition = {"$regex": "^" + re.escape(words[-1])}
+    if len(words) > 1:
+        condition["$all"] = words[:-1]
+    return {"search_tokens": condition}
+
+
+# Typeahead suggestions, best first: names starting with the query, then
+# listings where every word matches a token (whole-word hits ahead of
+# prefix-only hits). Both tiers are bounded index scans.
+def suggest(collection, text, base_filter=None, limit=8, projection=None):
+    base_filter = dict(base_filter or {})
+    if projection is not None:
+        projection = dict(projection, name_lower=1, search_tokens=1)
+    normalized = normalize_text(text)
+    if not normalized:
+        return []
+    prefix_query = dict(base_filter, name_lower={"$regex": "^" + re.escape(normalized)})
+    results = list(collection.find(prefix_query, projection).sort("name_lower", 1).limit(limit))
+    if len(results) < limit:
+        seen = [car["_id"] for car in results]
+        token_query = dict(base_filter, **name_filter(normalized))
+        if seen:
+            token_query["_id"] = {"$nin": seen}
+        candidates = list(collection.find(token_query, projection).limit(limit * 4))
+        last_word = normalized.split()[-1]
+        candidates.sort(key=lambda car: (
+            last_word not in car.get("search_tokens", []),
+            len(car.get("name_lower", "")),
+            car.get("price", 0)
+        ))
+        results.extend(candidates[:limit - len(results)])
+    return results
+
+
+# Adds the search fields to listings written before they (or model_key)
+# existed. Both $exists: false lookups are answered from the indexes.
+def backfill_search_fields(collection, batch_size=1000):
+    updated, ops = 0, []
+    missing = {"$or": [{"search_tokens": {"$exists": False}}, {"model_key": {"$exists": False}}]}
+    cursor = collection.find(missing, {"name": 1, "make": 1, "model": 1})
+    for car in cursor:
+        fields = search_fields(car.get("name"), car.get("make"), car.get("model"))
+        ops.append(UpdateOne({"_id": car["_id"]}, {"$set": fields}))
+        if len(ops) >= batch_size:
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += collection.bulk_write(ops, ordered=False).modified_count
+    return updated
@@ -0,0 +1,46 @@
+import datetime
+import json
+
+from bson import ObjectId
+from flask import Response
+
+from metrics import timed
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same JSON
+    orjson = None
+
+# Fields the listing cards and the profile page render. Reads project to
+# these so derived fields (name_lower, search_tokens, model_key) never leave
+# MongoDB.
+LISTING_FIELDS = [
+    "name", "location", "price", "year", "mileage", "fuel", "transmission", "postedDays",
+    "images", "thumbnails", "featured", "make", "model", "category"
+]
+LISTING_PROJECTION = dict.fromkeys(LISTING_FIELDS, 1)
+DETAIL_PROJECTION = dict(LISTING_PROJECTION, seller_email=1)
+
+
+# Called only for values the encoder does not know, so ObjectIds anywhere in
+# the document are converted in the same single pass that writes the JSON
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(data):
+        return orjson.dumps(data, default=_default)
+else:
+    def dumps(data):
+        return json.dumps(data, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(data, status=200):
+    with timed("serialize"):
+        body = dumps(data)
+    return Response(body, status=status, mimetype="application/json")
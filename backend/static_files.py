@@ -0,0 +1,92 @@
+import mimetypes
+import os
+from collections import namedtuple
+
+from flask import Response, request
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+from prediction_cache import TTLCache
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Precompressed siblings ("main.3f2a.js.br") in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+FileMeta = namedtuple("FileMeta", "path size mtime etag mimetype encodings")
+_MISSING = object()
+
+
+class StaticFiles:
+    # Serves files from one directory with long-lived caching. File metadata
+    # (size, mtime, ETag, precompressed siblings) is kept in a TTL cache so
+    # hot files are served with a single open() and no stat()/exists()
+    # calls; conditional requests that match the ETag never touch the disk.
+    # Range requests are handled by werkzeug's make_conditional().
+    def __init__(self, root, immutable=lambda path: False, stat_ttl=10, maxsize=4096):
+        self.root = root
+        self.immutable = immutable
+        self._meta = TTLCache(maxsize=maxsize, ttl=stat_ttl)
+
+    def lookup(self, path):
+        entry = self._meta.get(path)
+        if entry is None:
+            entry = self._stat(path) or _MISSING
+            self._meta.set(path, entry)
+        return None if entry is _MISSING else entry
+
+    def _stat(self, path):
+        full_path = safe_join(self.root, path)
+        if full_path is None:
+            return None
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+        if not os.path.isfile(full_path):
+            return None
+        encodings = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                encoded = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            encodings[encoding] = (full_path + suffix, encoded.st_size, f"{st.st_mtime_ns:x}-{encoded.st_size:x}-{encoding}")
+        mimetype = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        return FileMeta(full_path, st.st_size, st.st_mtime, f"{st.st_mtime_ns:x}-{st.st_size:x}", mimetype, encodings)
+
+    # Returns a response for path, or None when the file does not exist
+    def serve(self, path, cache_control=None):
+        meta = self.lookup(path)
+        if meta is None:
+            return None
+        file_path, size, etag, content_encoding = meta.path, meta.size, meta.etag, None
+        if meta.encodings and not request.range:
+            for encoding, _ in ENCODINGS:
+                if encoding in meta.encodings and encoding in request.accept_encodings:
+                    file_path, size, etag = meta.encodings[encoding]
+                    content_encoding = encoding
+                    break
+
+        response = Response(mimetype=meta.mimetype, direct_passthrough=True)
+        response.set_etag(etag)
+        response.last_modified = meta.mtime
+        response.headers["Cache-Control"] = cache_control or (IMMUTABLE if self.immutable(path) else REVALIDATE)
+        if meta.encodings:
+            response.vary.add("Accept-Encoding")
+        if content_encoding:
+            response.headers["Content-Encoding"] = content_encoding
+
+        if request.if_none_match.contains_weak(etag) and not request.range:
+            response.status_code = 304
+            return response
+        try:
+            file = open(file_path, "rb")
+        except OSError:
+            # Removed since it was cached
+            self._meta.clear()
+            return None
+        response.response = wrap_file(request.environ, file)
+        response.content_length = size
+        return response.make_conditional(request, accept_ranges=True, complete_length=size)
@@ -1,60 +1,285 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split
+import numpy as np
+from sklearn.model_selection import ParameterGrid, ParameterSampler, train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import hashlib
 import joblib
+import json
 import os
+import pickle
+import tempfile
+import time
+from forest_compiler import export_forest, load_compiled_forest
+from feature_schema import SCHEMA_VERSION, build_feature_schema, encode_frame, save_feature_schema
 
 # Set paths
 DATA_PATH = os.path.join(os.getcwd(), "data", "FYP_dataset.csv")
+CACHE_DIR = os.path.join(os.getcwd(), "data", ".cache")
 MODEL_PATH = os.path.join(os.getcwd(), "models", "random_forest_model.pkl")
 ENCODER_PATH = os.path.join(os.getcwd(), "models", "car_name_label_encoder.pkl")
+FOREST_PATH = os.path.join(os.getcwd(), "models", "random_forest_model.forest")
+SCHEMA_PATH = os.path.join(os.getcwd(), "models", "feature_schema.json")
+REPORT_PATH = os.path.join(os.getcwd(), "models", "search_report.json")
+TRIALS_PATH = os.path.join(os.getcwd(), "models", "search_trials.jsonl")
 
-# Create directories if they don't exist
-os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-
-# Load the dataset
-try:
-    df = pd.read_csv(DATA_PATH)
-    print("Dataset loaded successfully!")
-except FileNotFoundError:
-    print(f"Error: {DATA_PATH} not found. Please ensure modified_dataset.csv is in the data/ directory.")
-    exit(1)
-
-# Define features (X) and target (y)
-X = df.drop(columns=['Car Name'])
-y = df['Car Name']
-
-# Perform train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-print("Training set size:", X_train.shape)
-print("Test set size:", X_test.shape)
-
-# Initialize the label encoder
-label_encoder = LabelEncoder()
-
-# Encode categorical columns in X
-categorical_columns = ['Engine Type', 'Assembly', 'Body Type', 'Transmission Type', 'Registration Status']
-for col in categorical_columns:
-    X_train[col] = label_encoder.fit_transform(X_train[col])
-    X_test[col] = label_encoder.transform(X_test[col])
-
-# Encode the target variable (Car Name)
-y_train = label_encoder.fit_transform(y_train)
-y_test = label_encoder.transform(y_test)
-
-# Train the Random Forest model
-model = RandomForestClassifier(n_estimators=50, max_depth=50, min_samples_split=16, random_state=100)
-model.fit(X_train, y_train)
-
-# Evaluate the model
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Random Forest Accuracy: {accuracy:.4f}")
-
-# Save the model and label encoder
-joblib.dump(model, MODEL_PATH)
-joblib.dump(label_encoder, ENCODER_PATH)
-print(f"Model saved to {MODEL_PATH}")
-print(f"Label encoder saved to {ENCODER_PATH}")
\ No newline at end of file
+TARGET_COLUMN = 'Car Name'
+CATEGORICAL_COLUMNS = ['Engine Type', 'Assembly', 'Body Type', 'Transmission Type', 'Registration Status']
+DEFAULT_PARAMS = {"n_estimators": 50, "max_depth": 50, "min_samples_split": 16}
+SEARCH_SPACE = {
+    "n_estimators": [25, 50, 100],
+    "max_depth": [10, 20, 50],
+    "min_samples_split": [2, 8, 16, 32],
+    "min_samples_leaf": [1, 4],
+}
+RANDOM_STATE = 100
+
+
+# Read the CSV in chunks with categorical dtypes and downcast numerics, so
+# peak memory stays close to the size of the typed frame
+def load_dataset(path, chunksize):
+    dtypes = {col: "category" for col in CATEGORICAL_COLUMNS + [TARGET_COLUMN]}
+    chunks = []
+    for chunk in pd.read_csv(path, dtype=dtypes, chunksize=chunksize):
+        for col in chunk.columns:
+            if col not in dtypes:
+                chunk[col] = pd.to_numeric(chunk[col], downcast="integer" if chunk[col].dtype.kind == "i" else "float")
+        chunks.append(chunk)
+    df = pd.concat(chunks, ignore_index=True)
+    # Chunks can see different category sets; union them after the concat
+    for col in dtypes:
+        df[col] = df[col].astype("category")
+    return df
+
+
+def _cache_key(path):
+    st = os.stat(path)
+    key = json.dumps([os.path.abspath(path), st.st_mtime_ns, st.st_size, SCHEMA_VERSION, CATEGORICAL_COLUMNS])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+# Encoded feature matrix cached as one .npy file per column plus the schema,
+# so reruns skip CSV parsing and encoding entirely
+def load_features(path, chunksize=100000, use_cache=True):
+    cache_path = os.path.join(CACHE_DIR, _cache_key(path))
+    meta_path = os.path.join(cache_path, "meta.json")
+    if use_cache and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        columns = [np.load(os.path.join(cache_path, f"col{i}.npy")) for i in range(len(meta["schema"]["columns"]))]
+        y = np.load(os.path.join(cache_path, "target.npy"))
+        print(f"Loaded cached features from {cache_path}")
+        return np.column_stack(columns), y, meta["schema"], meta["classes"], cache_path
+
+    df = load_dataset(path, chunksize)
+    print(f"Dataset loaded successfully! ({len(df)} rows, {df.memory_usage(deep=True).sum() / 1e6:.1f} MB)")
+    y_raw = df.pop(TARGET_COLUMN)
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(y_raw.astype(str))
+    classes = [str(c) for c in label_encoder.classes_]
+    schema = build_feature_schema(df, CATEGORICAL_COLUMNS, target=TARGET_COLUMN, target_classes=classes)
+    X = encode_frame(df, schema).to_numpy(dtype=np.float64)
+
+    if use_cache:
+        os.makedirs(cache_path, exist_ok=True)
+        for i in range(X.shape[1]):
+            np.save(os.path.join(cache_path, f"col{i}.npy"), X[:, i])
+        np.save(os.path.join(cache_path, "target.npy"), y)
+        with open(meta_path, "w") as f:
+            json.dump({"schema": schema, "classes": classes}, f)
+    return X, y, schema, classes, cache_path
+
+
+def split(X, y):
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+
+# Per-row serving latency of the compiled forest, median of single-row calls
+def measure_latency(model, X, repeats=200):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = export_forest(model, os.path.join(tmp, "model.forest"))
+        forest = load_compiled_forest(path)
+        size_mb = os.path.getsize(path) / 1e6
+        rows = X[np.arange(repeats) % len(X)]
+        timings = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            forest.predict_proba(rows[i:i + 1])
+            timings.append(time.perf_counter() - start)
+        del forest
+    return float(np.median(timings) * 1000), size_mb
+
+
+_worker_data = None
+
+
+def _init_worker(cache_path, X, y):
+    global _worker_data
+    if X is None:
+        # Workers memory-map the cached columns instead of receiving copies
+        n_columns = len([name for name in os.listdir(cache_path) if name.startswith("col")])
+        X = np.column_stack([np.load(os.path.join(cache_path, f"col{i}.npy"), mmap_mode="r") for i in range(n_columns)])
+        y = np.load(os.path.join(cache_path, "target.npy"))
+    _worker_data = split(X, y)
+
+
+def run_trial(params):
+    X_train, X_test, y_train, y_test = _worker_data
+    model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    latency_ms, forest_mb = measure_latency(model, X_test)
+    return {
+        "params": params,
+        "accuracy": round(float(accuracy), 4),
+        "fit_seconds": round(fit_seconds, 3),
+        "predict_ms_per_row": round(latency_ms, 4),
+        "forest_mb": round(forest_mb, 3),
+        "pickle_mb": round(len(pickle.dumps(model)) / 1e6, 3),
+        "node_count": int(sum(e.tree_.node_count for e in model.estimators_)),
+    }
+
+
+def _trial_id(params, data_key):
+    return hashlib.sha1(json.dumps([params, data_key], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+# Process-pool search over forest parameters. Finished trials are appended to
+# TRIALS_PATH, so an interrupted search resumes where it stopped.
+def search(candidates, cache_path, X, y, workers, data_key):
+    done = {}
+    if os.path.exists(TRIALS_PATH):
+        with open(TRIALS_PATH) as f:
+            for line in f:
+                trial = json.loads(line)
+                done[trial["id"]] = trial
+    results, pending = [], []
+    for params in candidates:
+        trial_id = _trial_id(params, data_key)
+        if trial_id in done:
+            results.append(done[trial_id])
+        else:
+            pending.append((trial_id, params))
+    print(f"Search: {len(candidates)} candidates, {len(results)} already done, {len(pending)} to run on {workers} workers")
+
+    initargs = (cache_path, None, None) if cache_path else (None, X, y)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool, \
+            open(TRIALS_PATH, "a") as trials_file:
+        futures = {pool.submit(run_trial, params): trial_id for trial_id, params in pending}
+        for future in as_completed(futures):
+            trial = {"id": futures[future], **future.result()}
+            trials_file.write(json.dumps(trial) + "\n")
+            trials_file.flush()
+            results.append(trial)
+            print(f"  {trial['params']} -> accuracy {trial['accuracy']:.4f}, "
+                  f"{trial['predict_ms_per_row']:.3f} ms/row, {trial['forest_mb']:.1f} MB")
+    return results
+
+
+# Best accuracy among trials that meet the serving budgets
+def select(results, max_latency_ms=None, max_size_mb=None):
+    eligible = [
+        r for r in results
+        if (max_latency_ms is None or r["predict_ms_per_row"] <= max_latency_ms)
+        and (max_size_mb is None or r["forest_mb"] <= max_size_mb)
+    ]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda r: (r["accuracy"], -r["predict_ms_per_row"], -r["forest_mb"]))
+
+
+def print_report(results, chosen):
+    print(f"\n{'accuracy':>8} {'fit s':>7} {'ms/row':>7} {'forest MB':>9} {'pickle MB':>9}  params")
+    for r in sorted(results, key=lambda r: -r["accuracy"]):
+        marker = "*" if chosen is not None and r["params"] == chosen["params"] else " "
+        print(f"{r['accuracy']:>8.4f} {r['fit_seconds']:>7.2f} {r['predict_ms_per_row']:>7.3f} "
+              f"{r['forest_mb']:>9.2f} {r['pickle_mb']:>9.2f} {marker} {r['params']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the car recommendation Random Forest")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--search", choices=["none", "grid", "random"], default="none",
+                        help="search forest parameters instead of training the default model")
+    parser.add_argument("--n-iter", type=int, default=20, help="candidates for --search random")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=100000)
+    parser.add_argument("--no-cache", action="store_true", help="re-parse the CSV even if cached")
+    parser.add_argument("--max-latency-ms", type=float, help="per-row latency budget for the chosen model")
+    parser.add_argument("--max-size-mb", type=float, help="compiled forest size budget for the chosen model")
+    parser.add_argument("--no-save", action="store_true", help="only report, keep the current model")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+
+    try:
+        X, y, schema, classes, cache_path = load_features(args.data, args.chunksize, use_cache=not args.no_cache)
+    except FileNotFoundError:
+        print(f"Error: {args.data} not found. Please ensure FYP_dataset.csv is in the data/ directory.")
+        exit(1)
+
+    params = dict(DEFAULT_PARAMS)
+    if args.search != "none":
+        if args.search == "grid":
+            candidates = list(ParameterGrid(SEARCH_SPACE))
+        else:
+            candidates = list(ParameterSampler(SEARCH_SPACE, n_iter=args.n_iter, random_state=RANDOM_STATE))
+        candidates = [{k: int(v) for k, v in c.items()} for c in candidates]
+        data_key = os.path.basename(cache_path)
+        results = search(candidates, None if args.no_cache else cache_path, X, y, args.workers, data_key)
+        chosen = select(results, args.max_latency_ms, args.max_size_mb)
+        print_report(results, chosen)
+        with open(REPORT_PATH, "w") as f:
+            json.dump({"data": data_key, "chosen": chosen, "trials": results}, f, indent=2)
+        print(f"Search report saved to {REPORT_PATH}")
+        if chosen is None:
+            print("No candidate meets the latency/size budget; keeping the current model.")
+            return
+        params = chosen["params"]
+
+    if args.no_save:
+        return
+
+    X_train, X_test, y_train, y_test = split(X, y)
+    print("Training set size:", X_train.shape)
+    print("Test set size:", X_test.shape)
+
+    # Train the Random Forest model with named columns so the server can
+    # check its column order against the schema
+    X_train = pd.DataFrame(X_train, columns=schema["columns"])
+    X_test = pd.DataFrame(X_test, columns=schema["columns"])
+    model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=-1, **params)
+    model.fit(X_train, y_train)
+    model.n_jobs = None
+
+    # Evaluate the model
+    y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print(f"Random Forest Accuracy: {accuracy:.4f} with {params}")
+
+    # Save the model and label encoder
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = np.array(classes, dtype=object)
+    joblib.dump(model, MODEL_PATH)
+    joblib.dump(label_encoder, ENCODER_PATH)
+    print(f"Model saved to {MODEL_PATH}")
+    print(f"Label encoder saved to {ENCODER_PATH}")
+
+    save_feature_schema(schema, SCHEMA_PATH)
+    print(f"Feature schema {schema['fingerprint']} saved to {SCHEMA_PATH}")
+
+    # Export the flattened, memory-mappable forest used for serving
+    export_forest(model, FOREST_PATH)
+    print(f"Compiled forest saved to {FOREST_PATH}")
+
+
+if __name__ == "__main__":
+    main()
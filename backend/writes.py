@@ -0,0 +1,93 @@
+# Listing and profile writes, one batch at a time. These are the job queue's
+# handlers (jobs.py): each takes the payloads of the jobs of one kind that
+# were claimed together and writes them with a single bulk operation, then
+# one $inc per category for the stats. A synchronous request is a batch of
+# one. Payloads are validated by the request that queued them.
+#
+# A retried batch cannot tell which of its writes the failed attempt made
+# (an insert that went through is a duplicate now, an update finds its new
+# values already there), so instead of a delta it rebuilds the stats from
+# the cars with reconcile().
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from car_queries import live
+from car_stats import reconcile, record_added_many, record_updated_many
+from jobs import JobFailed
+from search import search_fields
+
+logger = logging.getLogger(__name__)
+
+DERIVED_FIELDS = ("name_lower", "search_tokens", "model_key")
+DUPLICATE_KEY = 11000
+
+
+# {"car": listing with its _id, "imageVariants": [...]}. The _id is assigned
+# by the request, so a job retried after its insert went through finds the
+# listing already there and counts as done.
+def insert_listings(db, payloads, retry=False):
+    cars = [payload["car"] for payload in payloads]
+    failed = repeated = set()
+    try:
+        db["cars"].insert_many(cars, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        failed = {error["index"] for error in errors if error.get("code") != DUPLICATE_KEY}
+        repeated = {error["index"] for error in errors if error.get("code") == DUPLICATE_KEY}
+    if retry:
+        reconcile(db["cars"], db["car_stats"])
+    else:
+        record_added_many(db["car_stats"], [car for i, car in enumerate(cars) if i not in failed | repeated])
+    logger.info(f"Listed {len(cars) - len(failed)} cars")
+
+    results = []
+    for i, payload in enumerate(payloads):
+        if i in failed:
+            results.append(JobFailed("Failed to list car", 500))
+            continue
+        car = {key: value for key, value in payload["car"].items() if key not in DERIVED_FIELDS}
+        results.append({"car": car, "imageVariants": payload.get("imageVariants", [])})
+    return results
+
+
+# {"id": ObjectId, "seller_email": ..., "set": fields to change}. Updates to
+# one listing apply in the order they were queued. on_write gets the
+# (old, new) pairs written.
+def update_listings(db, payloads, on_write=None, retry=False):
+    ids = list({payload["id"] for payload in payloads})
+    cars = {car["_id"]: car for car in db["cars"].find(live({"_id": {"$in": ids}}))}
+    ops, changes, results = [], [], []
+    for payload in payloads:
+        car = cars.get(payload["id"])
+        if car is None or car.get("seller_email") != payload["seller_email"]:
+            results.append(JobFailed("Car not found or not authorized", 404))
+            continue
+        update = dict(payload["set"])
+        if any(field in update for field in ("name", "make", "model")):
+            merged = {**car, **update}
+            update.update(search_fields(merged.get("name"), merged.get("make"), merged.get("model")))
+        cars[car["_id"]] = {**car, **update}
+        ops.append(UpdateOne({"_id": car["_id"]}, {"$set": update}))
+        changes.append((car, cars[car["_id"]]))
+        results.append({"id": str(car["_id"])})
+    if ops:
+        db["cars"].bulk_write(ops, ordered=True)
+        if retry:
+            reconcile(db["cars"], db["car_stats"])
+        else:
+            record_updated_many(db["car_stats"], changes)
+        if on_write:
+            on_write(changes)
+    return results
+
+
+# {"id": ObjectId, "email": ..., "set": fields to change}. on_write gets the
+# payloads written.
+def update_users(db, payloads, on_write=None):
+    db["users"].bulk_write([UpdateOne({"_id": payload["id"]}, {"$set": payload["set"]}) for payload in payloads],
+                           ordered=True)
+    if on_write:
+        on_write(payloads)
+    return [{"id": str(payload["id"])} for payload in payloads]
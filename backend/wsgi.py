@@ -0,0 +1,9 @@
+# WSGI entry point for production servers:
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Servers without gunicorn's fork hooks should call
+# app.extensions["drivewise"].start() once per process after loading this.
+from app import create_app
+
+app = create_app()
@@ -70,11 +70,12 @@ const FeaturedCars = () => {
         <div className="car-grid">
           {featuredCars.length > 0 ? (
             featuredCars.map((car) => {
+              const images = car.thumbnails && car.thumbnails.length > 0 ? car.thumbnails : car.images
               const imageUrl =
-                car.images && car.images.length > 0
-                  ? car.images[0].startsWith("/uploads")
-                    ? `http://localhost:5000${car.images[0]}`
-                    : car.images[0]
+                images && images.length > 0
+                  ? images[0].startsWith("/uploads")
+                    ? `http://localhost:5000${images[0]}`
+                    : images[0]
                   : "https://via.placeholder.com/300x200"
 
               return (
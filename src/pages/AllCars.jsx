@@ -313,8 +313,9 @@ const AllCars = () => {
             </div>
             <div className="car-grid">
               {cars.map((car) => {
-                const imageUrls = Array.isArray(car.images) && car.images.length > 0
-                  ? car.images.map(img => img.startsWith("/uploads") ? `http://localhost:5000${img}` : img)
+                const images = Array.isArray(car.thumbnails) && car.thumbnails.length > 0 ? car.thumbnails : car.images
+                const imageUrls = Array.isArray(images) && images.length > 0
+                  ? images.map(img => img.startsWith("/uploads") ? `http://localhost:5000${img}` : img)
                   : ["https://via.placeholder.com/300x225"];
                 const currentImageIndex = currentImages[car._id] || 0;
 
@@ -32,7 +32,8 @@ const UserProfilePage = () => {
 
   const BASE_URL = "http://localhost:5000";
 
-  const getCarImage = (images, baseUrl) => {
+  const getCarImage = (car, baseUrl) => {
+    const images = car.thumbnails && car.thumbnails.length ? car.thumbnails : car.images;
     if (!images || !images.length) return "https://via.placeholder.com/150";
     return `${baseUrl}${images[0]}`;
   };
@@ -404,11 +405,11 @@ const UserProfilePage = () => {
                     <div key={car._id} className="car-card">
                       <div className="car-image-container">
                         <img
-                          src={carImageErrors[car._id] ? "https://via.placeholder.com/150" : getCarImage(car.images, BASE_URL)}
+                          src={carImageErrors[car._id] ? "https://via.placeholder.com/150" : getCarImage(car, BASE_URL)}
                           alt={car.name}
                           className="car-image"
                           onError={() => {
-                            console.log("Car image URL:", car.images && car.images.length ? `${BASE_URL}${car.images[0]}` : "No valid image");
+                            console.log("Car image URL:", getCarImage(car, BASE_URL));
                             setCarImageErrors((prev) => ({ ...prev, [car._id]: true }));
                           }}
                         />